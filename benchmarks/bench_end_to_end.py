@@ -0,0 +1,182 @@
+# Measure egoist's own overhead against the local mock server, without the real API.
+#
+#   python -m benchmarks.bench_end_to_end [n_tokens] [runs]
+#
+# Reports time to first rendered token, per-token client overhead over a bare
+# httpx read of the same stream, tool dispatch latency, and the time
+# Conversation.run spends persisting messages under each fsync policy.
+from benchmarks.mock_openai_server import MockOpenAIServer, synthesize_text_recording
+from openai_service import InterruptFlag, OpenAIService
+from conversation import Conversation
+from journal import FsyncPolicy
+from tools.base_tool import BaseTool
+from models import FunctionCall, Message, ToolCall
+from toolkit import ToolKit
+
+from pydantic import BaseModel
+import contextlib
+import statistics
+import argparse
+import tempfile
+import asyncio
+import openai_service
+import httpx
+import time
+import sys
+import io
+import os
+
+
+class EchoInput(BaseModel):
+    text: str
+
+
+class EchoTool(BaseTool):
+    input_model = EchoInput
+
+    async def execute(self, input_data: EchoInput) -> str:
+        return input_data.text
+
+
+def timed(func, totals: dict, name: str):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            totals[name] = totals.get(name, 0.0) + time.perf_counter() - start
+
+    return wrapper
+
+
+def report(label: str, samples, unit: str = "ms", scale: float = 1000):
+    print(
+        f"{label:>36}: median {statistics.median(samples) * scale:9.3f} {unit}"
+        f"  min {min(samples) * scale:9.3f} {unit}",
+        file=sys.__stdout__,
+    )
+
+
+async def bench_ttft(server: MockOpenAIServer, runs: int):
+    first_token = []
+    original_print = openai_service.print
+
+    def recording_print(*args, **kwargs):
+        # The "Assistant: " header is printed before the request is sent
+        if args and args[0] not in ("Assistant: ", "") and not first_token_seen:
+            first_token_seen.append(time.perf_counter())
+        original_print(*args, **kwargs)
+
+    openai_service.print = recording_print
+    service = OpenAIService([], InterruptFlag(), client=httpx.AsyncClient(), base_url=server.base_url)
+    messages = [Message(role="user", content="hello")]
+    try:
+        for _ in range(runs):
+            first_token_seen = []
+            start = time.perf_counter()
+            await service.get_message(messages)
+            first_token.append(first_token_seen[0] - start)
+    finally:
+        openai_service.print = original_print
+        await service.client.aclose()
+    report("time to first rendered token", first_token)
+
+
+async def bench_per_token(server: MockOpenAIServer, n_tokens: int, runs: int):
+    server.default = "synthetic"
+    client = httpx.AsyncClient()
+    service = OpenAIService([], InterruptFlag(), client=client, base_url=server.base_url)
+    messages = [Message(role="user", content="hello")]
+    raw, full = [], []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            async with client.stream("POST", service.url, content=service.build_body(messages)) as response:
+                async for _ in response.aiter_lines():
+                    pass
+            raw.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await service.get_message(messages)
+            full.append(time.perf_counter() - start)
+    finally:
+        server.default = "text"
+        await client.aclose()
+    report("bare httpx read per token", [t / n_tokens for t in raw], "us", 1e6)
+    report("get_message per token", [t / n_tokens for t in full], "us", 1e6)
+    report(
+        "client overhead per token",
+        [(f - r) / n_tokens for f, r in zip(full, raw)],
+        "us",
+        1e6,
+    )
+
+
+async def bench_tool_dispatch(runs: int):
+    toolkit = ToolKit(auto_approve=True)
+    toolkit.tools["EchoTool"] = EchoTool(toolkit)
+    for n_calls in (1, 4):
+        tool_calls = [
+            ToolCall(
+                index=i, id=f"call_{i}", type="function",
+                function=FunctionCall(name="EchoTool", arguments='{"text": "hi"}'),
+            )
+            for i in range(n_calls)
+        ]
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            await toolkit.execute_tool_calls(tool_calls)
+            samples.append(time.perf_counter() - start)
+        report(f"dispatch {n_calls} tool call(s)", samples)
+    await toolkit.aclose()
+
+
+async def bench_persistence(server: MockOpenAIServer, runs: int):
+    args = argparse.Namespace(
+        prompt="run it", auto=False, state=False, outline=False, return_mode=True, resume=None,
+        yes=True, max_concurrency=4, http2=False, model="gpt-4-1106-preview",
+        fallback_model=None, max_retries=0, context_budget=None, base_url=server.base_url,
+    )
+    cwd = os.getcwd()
+    for policy in FsyncPolicy:
+        args.fsync = policy
+        totals_per_run, persistence = [], []
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                for _ in range(runs):
+                    # A tool call turn, then the text reply that follows the tool results
+                    server.script = ["tool_call", "text"]
+                    totals = {}
+                    start = time.perf_counter()
+                    conversation = Conversation(args, InterruptFlag())
+                    journal = conversation.journal
+                    journal.append = timed(journal.append, totals, "persist")
+                    journal.compact = timed(journal.compact, totals, "persist")
+                    await conversation.run()
+                    totals_per_run.append(time.perf_counter() - start)
+                    persistence.append(totals.get("persist", 0.0))
+            finally:
+                os.chdir(cwd)
+        report(f"Conversation.run (fsync={policy.value})", totals_per_run)
+        report("  of which persistence", persistence)
+
+
+async def main():
+    n_tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    server = MockOpenAIServer()
+    server.recordings["synthetic"] = synthesize_text_recording(n_tokens)
+    async with server:
+        # Rendering still happens, into a buffer instead of the terminal
+        with contextlib.redirect_stdout(io.StringIO()):
+            await bench_ttft(server, runs)
+            await bench_per_token(server, n_tokens, max(runs // 4, 3))
+            await bench_tool_dispatch(runs)
+            await bench_persistence(server, max(runs // 4, 3))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
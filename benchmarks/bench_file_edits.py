@@ -0,0 +1,67 @@
+# Compare batched FileTool line edits with one read/write cycle per edit.
+#
+#   python -m benchmarks.bench_file_edits [n_lines] [n_edits]
+from tools.file_tool import FileOperation, FileOperationType, FileTool, FileToolInput
+from pathlib import Path
+import tempfile
+import asyncio
+import random
+import time
+import sys
+import os
+
+
+def make_operations(path: str, n_lines: int, n_edits: int):
+    rng = random.Random(0)
+    kinds = [FileOperationType.INSERT_LINE, FileOperationType.UPDATE_LINE, FileOperationType.DELETE_LINE]
+    # Distinct lines, so every edit is valid against the original file
+    return [
+        FileOperation(
+            operation_type=rng.choice(kinds), path=path, line_number=line_number, content=f"edit {i}"
+        )
+        for i, line_number in enumerate(sorted(rng.sample(range(n_lines), n_edits)))
+    ]
+
+
+def legacy_apply(operations):
+    # What FileTool did before batching: a full read and write for every operation
+    for op in operations:
+        content = Path(op.path).read_text().splitlines()
+        match op.operation_type:
+            case FileOperationType.INSERT_LINE:
+                content.insert(op.line_number, op.content)
+            case FileOperationType.UPDATE_LINE:
+                content[op.line_number] = op.content
+            case FileOperationType.DELETE_LINE:
+                del content[min(op.line_number, len(content) - 1)]
+        Path(op.path).write_text("\n".join(content))
+
+
+def main():
+    n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    n_edits = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    original = "".join(f"    value_{i} = compute({i})  # some trailing comment\n" for i in range(n_lines))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "big.py")
+        operations = make_operations(path, n_lines, n_edits)
+        tool = FileTool(toolkit=None)
+
+        Path(path).write_text(original)
+        start = time.perf_counter()
+        legacy_apply(operations)
+        legacy = time.perf_counter() - start
+
+        Path(path).write_text(original)
+        start = time.perf_counter()
+        result = asyncio.run(tool.execute(FileToolInput(operations=operations)))
+        batched = time.perf_counter() - start
+        assert result == "File operations executed successfully.", result
+
+    print(f"{n_edits} edits to a {n_lines}-line file ({len(original) / 1e6:.1f} MB)")
+    print(f"  per-operation read/write: {legacy * 1000:9.1f} ms")
+    print(f"  batched, atomic replace:  {batched * 1000:9.1f} ms  ({legacy / batched:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
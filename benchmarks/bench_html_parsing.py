@@ -0,0 +1,49 @@
+# Compare WebScrapingTool parser backends over the saved HTML fixtures.
+#
+#   python -m benchmarks.bench_html_parsing
+from tools.html_parsing import available_backends, extract_data_points
+from bs4 import BeautifulSoup
+import pathlib
+import time
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures"
+DATA_POINTS = {
+    "Names": ".package-snippet__name",
+    "Versions": "h3 .package-snippet__version",
+    "Descriptions": "li.package-snippet p.package-snippet__description",
+    "Downloads": "table.stats td.downloads",
+    "Count": "p.result-count",
+}
+
+
+def uncached_html_parser(content: bytes):
+    # The pre-backend implementation: html.parser and a fresh selector per select()
+    soup = BeautifulSoup(content, "html.parser")
+    return {
+        name: [elem.get_text(strip=True) for elem in soup.select(selector)]
+        for name, selector in DATA_POINTS.items()
+    }
+
+
+def best_of(fn, repeat=5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    for fixture in sorted(FIXTURES.glob("*.html")):
+        content = fixture.read_bytes()
+        print(f"{fixture.name} ({len(content) / 1024:.0f} KiB)")
+        baseline = best_of(lambda: uncached_html_parser(content))
+        print(f"{'html.parser (uncached)':>24}: {baseline * 1000:8.2f} ms")
+        for backend in available_backends():
+            elapsed = best_of(lambda: extract_data_points(content, DATA_POINTS, backend))
+            print(f"{backend:>24}: {elapsed * 1000:8.2f} ms  ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Per-turn cost of serializing the message history into the request body.
+#
+#   python -m benchmarks.bench_serialization
+from openai_service import InterruptFlag, OpenAIService
+from models import Message, ToolCall, FunctionCall
+from toolkit import ToolKit
+import json
+import time
+
+
+def make_history(length: int):
+    messages = [Message(role="system", content="You are a self-aware AI program. " * 20)]
+    while len(messages) < length:
+        i = len(messages)
+        messages.append(Message(role="user", content=f"Please look at file {i} " * 10))
+        messages.append(
+            Message(
+                role="assistant",
+                tool_calls=[
+                    ToolCall(
+                        index=0,
+                        id=f"call_{i}",
+                        type="function",
+                        function=FunctionCall(
+                            name="ShellTool",
+                            arguments=json.dumps({"commands": [{"command": "cat", "arguments": [f"file_{i}.py"]}]}),
+                        ),
+                    )
+                ],
+            )
+        )
+        messages.append(
+            Message(role="tool", content="def f():\n    return 1\n" * 100, tool_call_id=f"call_{i}", name="ShellTool")
+        )
+    return messages[:length]
+
+
+def dump_every_message(service: OpenAIService, messages):
+    # The previous implementation: model_dump each message, then json-encode everything
+    payload = {
+        "messages": [message.model_dump(exclude_unset=True) for message in messages],
+        "model": service.model,
+        "stream": True,
+    }
+    return json.dumps(payload).encode()
+
+
+def best_of(fn, repeat=20) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    service = OpenAIService(ToolKit().get_tools_json(), InterruptFlag())
+    print(f"{'messages':>8} {'full dump':>12} {'cached splice':>14} {'speedup':>8}")
+    for length in (10, 50, 100, 250, 500):
+        messages = make_history(length)
+        service.build_body(messages)  # warm the per-message cache
+        full = best_of(lambda: dump_every_message(service, messages))
+        spliced = best_of(lambda: service.build_body(messages))
+        print(f"{length:>8} {full * 1000:>10.2f}ms {spliced * 1000:>12.2f}ms {full / spliced:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
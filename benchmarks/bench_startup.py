@@ -0,0 +1,62 @@
+# Startup cost of building a ToolKit and its tool schemas, from `python -X importtime`.
+#
+#   python -m benchmarks.bench_startup [runs]
+#
+# "lazy" loads tools through tools/manifest.json, "eager" ignores the manifest
+# and imports every tool module like the old ToolKit.load_tools did.
+from typing import Dict, Tuple
+import subprocess
+import statistics
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_CODE = "import toolkit; {setup}toolkit.ToolKit().get_tools_json()"
+SCENARIOS = {
+    "lazy": STARTUP_CODE.format(setup=""),
+    "eager": STARTUP_CODE.format(setup="toolkit.load_manifest = lambda: None; "),
+}
+# Dependencies only individual tools need
+HEAVY_MODULES = ("asyncpg", "bs4", "selectolax", "soupsieve", "lxml")
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """Return `{module: (self us, cumulative us)}` from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure(code: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - start, parse_importtime(result.stderr)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for label, code in SCENARIOS.items():
+        samples = [measure(code) for _ in range(runs)]
+        wall = statistics.median(wall for wall, _ in samples)
+        imports = samples[-1][1]
+        import_ms = sum(self_us for self_us, _ in imports.values()) / 1000
+        heavy = [name for name in HEAVY_MODULES if name in imports]
+        print(
+            f"{label:>6}: wall {wall * 1000:7.1f} ms  imports {import_ms:7.1f} ms"
+            f"  {len(imports):4} modules  heavy: {', '.join(heavy) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Compare per-token decoding cost of the lean SSE path with full StreamChunk validation.
+#
+#   python -m benchmarks.bench_stream_decoding [n_tokens]
+from openai_service import StreamAccumulator, decode_stream_line
+import json
+import sys
+import time
+
+
+def make_lines(n_tokens: int):
+    def chunk(delta, finish_reason=None):
+        return json.dumps(
+            {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": 1700000000,
+                "model": "gpt-4-1106-preview",
+                "system_fingerprint": "fp_bench",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+        )
+
+    # Half text, half streamed tool call arguments
+    lines = [chunk({"role": "assistant", "content": ""})]
+    lines += [chunk({"content": f" tok{i}"}) for i in range(n_tokens // 2)]
+    lines.append(
+        chunk(
+            {"tool_calls": [{"index": 0, "id": "call_1", "type": "function",
+                             "function": {"name": "ShellTool", "arguments": ""}}]}
+        )
+    )
+    lines += [
+        chunk({"tool_calls": [{"index": 0, "function": {"arguments": f"a{i}"}}]})
+        for i in range(n_tokens - n_tokens // 2)
+    ]
+    lines.append(chunk({}, finish_reason="tool_calls"))
+    return lines
+
+
+def run(lines, validate: bool) -> float:
+    start = time.perf_counter()
+    accumulator = StreamAccumulator()
+    for line in lines:
+        delta, _ = decode_stream_line(line, validate=validate)
+        accumulator.add_delta(delta)
+    accumulator.to_message()
+    return time.perf_counter() - start
+
+
+def main():
+    n_tokens = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    lines = make_lines(n_tokens)
+    for label, validate in [("validated StreamChunk", True), ("lean delta", False)]:
+        best = min(run(lines, validate) for _ in range(5))
+        print(f"{label:>22}: {best * 1000:8.2f} ms  {len(lines) / best:12,.0f} tokens/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# Local stand-in for the chat completions endpoint that replays recorded SSE streams.
+#
+#   python -m benchmarks.mock_openai_server [--port 8000] [--token-rate 50] [--recording text]
+#   OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python main.py "hello"
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+
+STREAMS_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "streams")
+
+
+def load_recordings(directory: str = STREAMS_DIR) -> Dict[str, List[str]]:
+    """Return `{name: [data payload, ...]}` for every `<name>.jsonl` in `directory`.
+
+    Each line of a recording is one `data:` payload exactly as captured from the API.
+    """
+    recordings = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".jsonl"):
+            with open(os.path.join(directory, filename)) as fp:
+                recordings[filename[: -len(".jsonl")]] = [
+                    line.rstrip("\n") for line in fp if line.strip()
+                ]
+    return recordings
+
+
+def make_chunk(delta: Dict, finish_reason: Optional[str] = None, model: str = "gpt-4-1106-preview") -> str:
+    return json.dumps(
+        {
+            "id": "chatcmpl-synthetic",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": model,
+            "system_fingerprint": "fp_synthetic",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        },
+        separators=(",", ":"),
+    )
+
+
+def synthesize_text_recording(n_tokens: int) -> List[str]:
+    return (
+        [make_chunk({"role": "assistant", "content": ""})]
+        + [make_chunk({"content": f" tok{i}"}) for i in range(n_tokens)]
+        + [make_chunk({}, finish_reason="stop")]
+    )
+
+
+class MockOpenAIServer:
+    """Minimal HTTP/1.1 server for `POST /v1/chat/completions`.
+
+    Each request is answered from `script` if it is non-empty, otherwise with
+    the `default` recording. A script entry is either a recording name, or a
+    dict with `status` (and optional `headers`) for an error response, or with
+    `recording` and `drop_after` to close the connection mid-stream. Received
+    request bodies are kept in `requests`. `token_rate` throttles replay to that
+    many chunks per second; None streams as fast as possible.
+    """
+
+    def __init__(
+        self,
+        recordings: Optional[Dict[str, List[str]]] = None,
+        default: str = "text",
+        token_rate: Optional[float] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.recordings = recordings if recordings is not None else load_recordings()
+        self.default = default
+        self.token_rate = token_rate
+        self.host = host
+        self.port = port
+        self.script: List[str | Dict] = []
+        self.requests: List[Dict] = []
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # Keep-alive: serve requests until the client hangs up
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                method, path, _ = request_line.split(" ", 2)
+                if method != "POST" or not path.endswith("/chat/completions"):
+                    await self.send_json(writer, 404, {"error": {"message": f"No route for {method} {path}"}})
+                    continue
+                self.requests.append(json.loads(body or b"{}"))
+                if not await self.respond(writer):
+                    break
+        finally:
+            writer.close()
+
+    async def respond(self, writer: asyncio.StreamWriter) -> bool:
+        entry = self.script.pop(0) if self.script else self.default
+        if isinstance(entry, str):
+            entry = {"recording": entry}
+        if "status" in entry:
+            await self.send_json(
+                writer,
+                entry["status"],
+                {"error": {"message": entry.get("message", "scripted error")}},
+                entry.get("headers"),
+            )
+            return True
+
+        lines = self.recordings[entry["recording"]]
+        drop_after = entry.get("drop_after")
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        delay = 1 / self.token_rate if self.token_rate else 0
+        for i, line in enumerate(lines):
+            if drop_after is not None and i >= drop_after:
+                writer.transport.abort()
+                return False
+            if delay and i:
+                await asyncio.sleep(delay)
+            self.write_chunk(writer, f"data: {line}\n\n".encode())
+            await writer.drain()
+        self.write_chunk(writer, b"data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return True
+
+    def write_chunk(self, writer: asyncio.StreamWriter, data: bytes):
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    async def send_json(
+        self, writer: asyncio.StreamWriter, status: int, payload: Dict, headers: Optional[Dict] = None
+    ):
+        body = json.dumps(payload).encode()
+        head = [f"HTTP/1.1 {status} Mock", "Content-Type: application/json", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+
+async def serve(args: argparse.Namespace):
+    server = MockOpenAIServer(
+        default=args.recording, token_rate=args.token_rate, host=args.host, port=args.port
+    )
+    await server.start()
+    print(f"Serving {sorted(server.recordings)} at {server.base_url}")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded chat completion streams locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--token-rate", type=float, default=None, help="Chunks per second, unthrottled by default")
+    parser.add_argument("--recording", default="text", help="Recording replayed for every request")
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
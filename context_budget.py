@@ -0,0 +1,193 @@
+from models import Message
+from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4-1106-preview": 128_000,
+    "gpt-4-32k": 32_768,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo-1106": 16_385,
+    "gpt-3.5-turbo": 4_096,
+}
+DEFAULT_CONTEXT_WINDOW = 8_192
+# Per-message framing the API adds around role and content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    return tiktoken.get_encoding("cl100k_base") if tiktoken else None
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    # Roughly four characters per token for English text and code
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: Message) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.content)
+    for tool_call in message.tool_calls or []:
+        if tool_call.function:
+            tokens += estimate_tokens(tool_call.function.name)
+            tokens += estimate_tokens(tool_call.function.arguments)
+    return tokens
+
+
+class ContextBudgeter:
+    """Fits the conversation into the model's context window before each request.
+
+    The leading system prompt and the most recent turns are always sent as is.
+    Once over budget, oversized tool outputs are truncated, and anything older
+    that still doesn't fit is collapsed into a single summary message. Per-message token counts, truncated
+    tool outputs and summary lines are cached, so each turn only pays for new
+    messages.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        reserve_tokens: int = 4_096,
+        max_tool_output_tokens: int = 4_000,
+        summary_tokens: int = 1_000,
+    ) -> None:
+        self.max_tokens = max_tokens
+        # Left free for the reply
+        self.reserve_tokens = reserve_tokens
+        self.max_tool_output_tokens = max_tool_output_tokens
+        self.summary_tokens = summary_tokens
+        # id(message) -> (message, value); holding the message keeps its id from being reused
+        self.token_cache: Dict[int, Tuple[Message, int]] = {}
+        self.truncated_cache: Dict[int, Tuple[Message, Message]] = {}
+        self.summary_cache: Dict[int, Tuple[Message, str]] = {}
+        self.last_summary: Optional[Tuple] = None
+
+    @classmethod
+    def for_model(cls, model: str, max_tokens: Optional[int] = None, **kwargs):
+        return cls(
+            max_tokens or MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW),
+            **kwargs,
+        )
+
+    def fit(self, messages: List[Message], extra_tokens: int = 0) -> List[Message]:
+        budget = self.max_tokens - self.reserve_tokens - extra_tokens
+
+        head_length = 1 if messages and messages[0].role == "system" else 0
+        head = messages[:head_length]
+        body = messages[head_length:]
+
+        head_tokens = sum(self.tokens(message) for message in head)
+        if head_tokens + sum(self.tokens(message) for message in body) <= budget:
+            return messages
+
+        # Only once over budget: shorten oversized tool outputs before dropping anything
+        body = [self.truncate_tool_output(message) for message in body]
+        body_tokens = [self.tokens(message) for message in body]
+        if head_tokens + sum(body_tokens) <= budget:
+            return head + body
+
+        if not body:
+            return head
+
+        # Keep as many recent messages as fit next to the summary, always at least the last one
+        available = budget - head_tokens - self.summary_tokens
+        start = len(body) - 1
+        used = body_tokens[start]
+        while start > 0 and used + body_tokens[start - 1] <= available:
+            start -= 1
+            used += body_tokens[start]
+        # Tool results must directly follow the assistant message that called them,
+        # so skip past the group, or if nothing follows it, keep its assistant message too
+        if body[start].role == "tool":
+            end = start
+            while end < len(body) and body[end].role == "tool":
+                end += 1
+            if end < len(body):
+                start = end
+            else:
+                while start > 0 and body[start].role == "tool":
+                    start -= 1
+        if start == 0:
+            return head + body
+
+        return head + [self.summarize(body[:start])] + body[start:]
+
+    def tokens(self, message: Message) -> int:
+        cached = self.token_cache.get(id(message))
+        if cached is None or cached[0] is not message:
+            cached = (message, message_tokens(message))
+            self.token_cache[id(message)] = cached
+        return cached[1]
+
+    def truncate_tool_output(self, message: Message) -> Message:
+        if message.role != "tool" or self.tokens(message) <= self.max_tool_output_tokens:
+            return message
+        cached = self.truncated_cache.get(id(message))
+        if cached is None or cached[0] is not message:
+            # Keep the start and end of the output, where results and errors usually are,
+            # sized by this output's own characters per token (code and JSON run dense)
+            content = message.content
+            chars_per_token = len(content) / max(estimate_tokens(content), 1)
+            keep_chars = int(self.max_tool_output_tokens * chars_per_token) // 2
+            omitted = len(content) - 2 * keep_chars
+            marker = f"\n[... {omitted} characters of tool output omitted ...]\n"
+            if omitted <= len(marker):
+                # Nothing worth cutting
+                truncated = message
+            else:
+                truncated = message.model_copy(
+                    update={"content": content[:keep_chars] + marker + content[-keep_chars:]}
+                )
+            cached = (message, truncated)
+            self.truncated_cache[id(message)] = cached
+        return cached[1]
+
+    def summarize(self, messages: List[Message]) -> Message:
+        # Reuse the previous turn's summary while the collapsed range is unchanged
+        key = (len(messages), id(messages[0]), id(messages[-1]))
+        if self.last_summary and self.last_summary[0] == key:
+            return self.last_summary[1]
+
+        lines = []
+        used = 0
+        # Newest first, so if the summary itself overflows the oldest lines are the ones dropped
+        for message in reversed(messages):
+            line = self.summary_line(message)
+            used += estimate_tokens(line)
+            if used > self.summary_tokens:
+                lines.append(f"- ... {len(messages) - len(lines)} earlier messages omitted")
+                break
+            lines.append(line)
+        lines.reverse()
+        summary = Message(
+            role="system",
+            content="Summary of earlier conversation, condensed to fit the context window:\n"
+            + "\n".join(lines),
+        )
+        self.last_summary = (key, summary, messages[0], messages[-1])
+        return summary
+
+    def summary_line(self, message: Message) -> str:
+        cached = self.summary_cache.get(id(message))
+        if cached is None or cached[0] is not message:
+            parts = []
+            if message.content:
+                parts.append(" ".join(message.content.split())[:200])
+            for tool_call in message.tool_calls or []:
+                if tool_call.function:
+                    parts.append(
+                        f"called {tool_call.function.name}({(tool_call.function.arguments or '')[:100]})"
+                    )
+            name = f" {message.name}" if message.name else ""
+            cached = (message, f"- {message.role}{name}: {' '.join(parts)}")
+            self.summary_cache[id(message)] = cached
+        return cached[1]
@@ -1,13 +1,13 @@
 from openai_service import OpenAIService, InterruptFlag
-from toolkit import ToolKit
+from journal import ConversationJournal
+from context_budget import ContextBudgeter
+from toolkit import SpeculativeDispatcher, ToolKit
 from models import Message
-from typing import List
+from typing import List, Optional
 from rich import print
 import datetime
 import argparse
-import asyncio
 import json
-import os
 
 
 class Conversation:
@@ -16,31 +16,58 @@ class Conversation:
         self.flag = flag
         self.auto = True if args.auto else False
         self.messages: List[Message] = []
-        self.conversation_id = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
-        self.initialize_messages()
-        self.toolkit = ToolKit()
+        if args.resume:
+            self.conversation_id = args.resume
+            self.journal, self.messages = ConversationJournal.resume(
+                self.conversation_id, fsync_policy=args.fsync
+            )
+            print(f"resumed conversation {self.conversation_id} ({len(self.messages)} messages)")
+            self.add_message(Message(role="user", content=args.prompt))
+        else:
+            self.conversation_id = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
+            self.journal = ConversationJournal(
+                self.conversation_id, fsync_policy=args.fsync
+            )
+            self.initialize_messages()
+        self.toolkit = ToolKit(
+            max_concurrency=args.max_concurrency, auto_approve=args.yes
+        )
 
-        # assume we always want to use the latest model, gpt-4-1106-preview
         self.openai_service = OpenAIService(
-            self.toolkit.get_tools_json(), flag, verbose=False
+            self.toolkit.get_tools_json(),
+            flag,
+            verbose=False,
+            client=self.toolkit.http_clients.get("openai", http2=args.http2),
+            model=args.model,
+            fallback_model=args.fallback_model,
+            max_retries=args.max_retries,
+            base_url=args.base_url,
+            budgeter=ContextBudgeter.for_model(
+                args.model, max_tokens=args.context_budget
+            ),
         )
         self.force = False
 
     async def run(self):
         while True:
-            # get a message from GPT
+            # get a message from GPT, starting read-only tool calls as they complete;
+            # without auto approval nothing may run early, so skip the completion checks
+            speculative = SpeculativeDispatcher(self.toolkit) if self.toolkit.auto_approve else None
             message = await self.openai_service.get_message(
-                self.messages, tools=True, force=True if self.auto else self.force
+                self.messages,
+                tools=True,
+                force=True if self.auto else self.force,
+                on_tool_call=speculative,
             )
             self.add_message(message)
 
-            if message.tool_calls:
-                tool_call_tasks = []
-                for tool_call in message.tool_calls:
-                    tool_call_tasks.append(
-                        asyncio.create_task(self.toolkit.execute_tool(tool_call))
-                    )
-                results = await asyncio.gather(*tool_call_tasks)
+            if not message.tool_calls:
+                if speculative:
+                    speculative.cancel()
+            else:
+                results = await self.toolkit.execute_tool_calls(
+                    message.tool_calls, speculative=speculative
+                )
 
                 print("=> ")
                 for result in results:
@@ -68,21 +95,25 @@ class Conversation:
                     self.add_message(message)
 
             if self.args.return_mode:
+                await self.aclose()
                 return message.content
 
             if not self.auto:
                 user_input = self.get_input()
+                if user_input is None:
+                    await self.aclose()
+                    exit(0)
                 self.add_message(Message(role="user", content=user_input))
 
-    def get_input(self) -> str:
+    def get_input(self) -> Optional[str]:
         self.force = False
         while True:
             try:
                 user_input = input("> ")
                 if user_input == "list tools":
                     print(f"Tool menu:")
-                    for tool_name, tool in self.toolkit.tools.items():
-                        print(f"{tool_name} --- {tool.description}")
+                    for tool_name in self.toolkit.tools:
+                        print(f"{tool_name} --- {self.toolkit.tools.description(tool_name)}")
 
                 elif user_input == "read":
                     return open("prompt.txt").read()
@@ -95,7 +126,7 @@ class Conversation:
                     return user_input
             except EOFError:
                 print(f"CTRL+D detected, exiting program...")
-                exit(0)
+                return None
 
     def initialize_messages(self):
         # system_prompt = "You are an AI program with agency. You can choose to respond to the user with text, or use the tools that are exposed to you. Do not use tools if you can answer the question easily, such as `what is 2+2`."
@@ -105,6 +136,12 @@ class Conversation:
         if self.args.state:
             print("including system state")
             system_prompt += f"Current project source code:\n{open('state.txt').read()}"
+        elif self.args.outline:
+            # Imported here so the tool module is still only loaded on demand
+            from tools.symbol_tool import SymbolIndex
+
+            print("including project outline")
+            system_prompt += f"Project outline, use SymbolTool to read definitions:\n{SymbolIndex().outline()}"
 
         self.add_message(Message(role="system", content=system_prompt))
         self.add_message(Message(role="user", content=self.args.prompt))
@@ -116,13 +153,11 @@ class Conversation:
         return jsons
 
     def add_message(self, message: Message):
-        conversations_dir = os.path.join(os.getcwd(), "conversations")
-        if not os.path.exists(conversations_dir):
-            os.makedirs(conversations_dir)
         self.messages.append(message)
+        self.journal.append(message)
 
-        conversation_path = os.path.join(
-            conversations_dir, f"{self.conversation_id}.json"
-        )
-        with open(conversation_path, "w") as fp:
-            json.dump(self.get_messages_json(), fp, indent=4)
+    async def aclose(self):
+        # Write the pretty-printed conversations/<id>.json view from the journal
+        self.journal.compact()
+        self.journal.close()
+        await self.toolkit.aclose()
@@ -0,0 +1,268 @@
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from collections import Counter
+import hashlib
+import httpx
+import json
+import time
+import os
+
+# Request headers that change the response, and so are part of the cache key
+VARY_HEADERS = ("accept", "accept-language", "authorization", "cookie")
+# Response headers that describe the wire encoding rather than the stored body
+HOP_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection")
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+def parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class ResponseCache:
+    """Size-bounded on-disk cache of GET responses with HTTP revalidation.
+
+    Entries live in `index.json`, keyed by a hash of method, URL and the request
+    headers in VARY_HEADERS. Bodies are stored once per content hash under
+    `bodies/`, and least recently used entries are evicted past `max_bytes`.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 50 * 1024 * 1024) -> None:
+        self.directory = directory or os.path.join(os.getcwd(), ".cache", "http")
+        self.bodies_dir = os.path.join(self.directory, "bodies")
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.max_bytes = max_bytes
+        self.entries: Optional[Dict[str, Dict]] = None
+        # The index has changes not yet written to disk
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def stats(self) -> Dict[str, int]:
+        self.load()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes(),
+        }
+
+    async def get(
+        self, client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]] = None, **kwargs
+    ) -> httpx.Response:
+        headers = dict(headers or {})
+        key, entry, cached = self.lookup_request(url, headers)
+        if cached:
+            return cached
+        response = await client.get(url, headers=headers, **kwargs)
+
+        if entry and response.status_code == 304:
+            self.revalidations += 1
+            self.refresh(key, entry, response)
+            return self.to_response(key, entry)
+
+        self.misses += 1
+        if key:
+            self.store(key, url, response, response.content)
+        return response
+
+    def lookup_request(
+        self, url: str, headers: Dict[str, str]
+    ) -> Tuple[Optional[str], Optional[Dict], Optional[httpx.Response]]:
+        """Cache side of a GET before it is sent: `(key, entry, fresh response)`.
+
+        The key is None when the request's Cache-Control forbids using the cache.
+        When a stored entry needs revalidating, its conditional headers are added
+        to `headers`.
+        """
+        directives = parse_cache_control(
+            next((v for k, v in headers.items() if k.lower() == "cache-control"), None)
+        )
+        if "no-store" in directives:
+            return None, None, None
+
+        key = self.key("GET", url, headers)
+        entry = self.lookup(key)
+        if entry and self.is_fresh(entry) and "no-cache" not in directives:
+            self.hits += 1
+            return key, entry, self.to_response(key, entry)
+        if entry:
+            headers.update(self.conditional_headers(entry))
+        return key, entry, None
+
+    def key(self, method: str, url: str, headers: Optional[Dict[str, str]] = None) -> str:
+        lowered = {k.lower(): v for k, v in (headers or {}).items()}
+        varying = [f"{name}:{lowered.get(name, '')}" for name in VARY_HEADERS]
+        return hashlib.sha256("\n".join([method.upper(), url, *varying]).encode()).hexdigest()
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        self.load()
+        entry = self.entries.get(key)
+        if entry and not os.path.exists(self.body_path(entry["body"])):
+            self.remove(key)
+            return None
+        return entry
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() < entry["expires_at"]
+
+    def conditional_headers(self, entry: Dict) -> Dict[str, str]:
+        conditional = {}
+        if entry.get("etag"):
+            conditional["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            conditional["If-Modified-Since"] = entry["last_modified"]
+        return conditional
+
+    def freshness_lifetime(self, response: httpx.Response) -> Optional[float]:
+        """Seconds the response may be served without revalidation, None if it must not be stored."""
+        directives = parse_cache_control(response.headers.get("cache-control"))
+        if "no-store" in directives:
+            return None
+        if "no-cache" in directives:
+            return 0.0
+        for name in ("s-maxage", "max-age"):
+            if (directives.get(name) or "").isdigit():
+                age = response.headers.get("age", "0")
+                return float(directives[name]) - (float(age) if age.isdigit() else 0.0)
+        expires = parse_http_date(response.headers.get("expires"))
+        if expires is not None:
+            date = parse_http_date(response.headers.get("date")) or time.time()
+            return expires - date
+        return 0.0
+
+    def store(self, key: str, url: str, response: httpx.Response, content: bytes) -> bool:
+        if response.request.method != "GET" or response.status_code != 200:
+            return False
+        lifetime = self.freshness_lifetime(response)
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        # Not worth storing what can neither be served fresh nor revalidated
+        if lifetime is None or (lifetime <= 0 and not etag and not last_modified):
+            return False
+        if len(content) > self.max_bytes:
+            return False
+
+        digest = hashlib.sha256(content).hexdigest()
+        body_path = self.body_path(digest)
+        if not os.path.exists(body_path):
+            os.makedirs(self.bodies_dir, exist_ok=True)
+            with open(body_path + ".tmp", "wb") as fp:
+                fp.write(content)
+            os.replace(body_path + ".tmp", body_path)
+
+        self.load()
+        old_entry = self.entries.pop(key, None)
+        self.entries[key] = {
+            "url": url,
+            "status": response.status_code,
+            "headers": {
+                k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS
+            },
+            "body": digest,
+            "size": len(content),
+            "etag": etag,
+            "last_modified": last_modified,
+            "expires_at": time.time() + max(lifetime, 0.0),
+            "last_access": time.time(),
+        }
+        if old_entry:
+            self.release_body(old_entry["body"])
+        self.evict()
+        self.save()
+        return True
+
+    def refresh(self, key: str, entry: Dict, response: httpx.Response):
+        lifetime = self.freshness_lifetime(response)
+        entry["expires_at"] = time.time() + max(lifetime or 0.0, 0.0)
+        entry["etag"] = response.headers.get("etag", entry.get("etag"))
+        entry["last_modified"] = response.headers.get("last-modified", entry.get("last_modified"))
+        self.save()
+
+    def to_response(self, key: str, entry: Dict) -> httpx.Response:
+        entry["last_access"] = time.time()
+        # Keep the LRU order of the index in step with access times
+        self.entries[key] = self.entries.pop(key)
+        with open(self.body_path(entry["body"]), "rb") as fp:
+            content = fp.read()
+        # Hits only reorder the index; it is written with the next change or on flush()
+        self.dirty = True
+        return httpx.Response(
+            entry["status"],
+            headers=entry["headers"],
+            content=content,
+            request=httpx.Request("GET", entry["url"]),
+        )
+
+    def body_path(self, digest: str) -> str:
+        return os.path.join(self.bodies_dir, digest)
+
+    def total_bytes(self) -> int:
+        # Bodies are shared between entries with identical content
+        return sum({entry["body"]: entry["size"] for entry in self.entries.values()}.values())
+
+    def evict(self):
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        references = Counter(entry["body"] for entry in self.entries.values())
+        # The index is kept in least recently used order, so evict from the front
+        for key in list(self.entries):
+            if total <= self.max_bytes:
+                break
+            entry = self.entries.pop(key)
+            references[entry["body"]] -= 1
+            if not references[entry["body"]]:
+                total -= entry["size"]
+                self.delete_body(entry["body"])
+        self.dirty = True
+
+    def remove(self, key: str):
+        entry = self.entries.pop(key)
+        self.release_body(entry["body"])
+        self.dirty = True
+
+    def release_body(self, digest: str):
+        if all(entry["body"] != digest for entry in self.entries.values()):
+            self.delete_body(digest)
+
+    def delete_body(self, digest: str):
+        try:
+            os.remove(self.body_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def load(self):
+        if self.entries is not None:
+            return
+        try:
+            with open(self.index_path) as fp:
+                self.entries = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def flush(self):
+        # Persist access times and order changed by cache hits since the last save
+        if self.dirty:
+            self.save()
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.index_path + ".tmp", "w") as fp:
+            json.dump(self.entries, fp)
+        os.replace(self.index_path + ".tmp", self.index_path)
+        self.dirty = False
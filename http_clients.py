@@ -0,0 +1,45 @@
+from typing import Dict
+from rich import print
+import importlib.util
+import httpx
+
+
+class HttpClientRegistry:
+    """Named, long-lived httpx clients shared by the toolkit and OpenAIService.
+
+    Reusing one client keeps its connection pool (and TLS sessions) warm across
+    tool invocations. Clients are bound to the event loop they are first used
+    on, so they must only be used from the main loop.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 30.0,
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, name: str = "default", http2: bool = False) -> httpx.AsyncClient:
+        client = self.clients.get(name)
+        if client is None or client.is_closed:
+            if http2 and importlib.util.find_spec("h2") is None:
+                print("HTTP/2 requested but the `h2` package is not installed, using HTTP/1.1")
+                http2 = False
+            client = httpx.AsyncClient(
+                limits=self.limits, timeout=self.timeout, http2=http2
+            )
+            self.clients[name] = client
+        return client
+
+    async def aclose(self):
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
@@ -0,0 +1,110 @@
+from models import Message
+from typing import List, Optional
+from enum import Enum
+import json
+import os
+
+
+class FsyncPolicy(str, Enum):
+    # fsync after every appended message (durable across power loss)
+    ALWAYS = "always"
+    # flush to the OS after every message (durable across process crashes)
+    FLUSH = "flush"
+    # leave buffering to Python, only flushed on close / compaction
+    NEVER = "never"
+
+
+class ConversationJournal:
+    """Append-only JSONL log of a conversation, one message per line.
+
+    Appending costs O(message) regardless of history length; the pretty-printed
+    `<id>.json` view is only produced when `compact` is called.
+    """
+
+    def __init__(
+        self,
+        conversation_id: str,
+        directory: Optional[str] = None,
+        fsync_policy: FsyncPolicy = FsyncPolicy.FLUSH,
+    ) -> None:
+        self.conversation_id = conversation_id
+        self.directory = directory or os.path.join(os.getcwd(), "conversations")
+        self.fsync_policy = FsyncPolicy(fsync_policy)
+        self.path = os.path.join(self.directory, f"{conversation_id}.jsonl")
+        self.json_path = os.path.join(self.directory, f"{conversation_id}.json")
+        self.fp = None
+
+    def open(self):
+        if self.fp is None:
+            os.makedirs(self.directory, exist_ok=True)
+            torn_tail = False
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                with open(self.path, "rb") as fp:
+                    fp.seek(-1, os.SEEK_END)
+                    torn_tail = fp.read(1) != b"\n"
+            self.fp = open(self.path, "a", encoding="utf-8")
+            # Terminate a torn final line so it can't swallow the next append
+            if torn_tail:
+                self.fp.write("\n")
+        return self.fp
+
+    def append(self, message: Message):
+        fp = self.open()
+        fp.write(
+            message.model_dump_json(exclude_unset=True, exclude_none=True) + "\n"
+        )
+        if self.fsync_policy != FsyncPolicy.NEVER:
+            fp.flush()
+        if self.fsync_policy == FsyncPolicy.ALWAYS:
+            os.fsync(fp.fileno())
+
+    def load(self) -> List[Message]:
+        if self.fp is not None:
+            self.fp.flush()
+        if not os.path.exists(self.path):
+            return []
+
+        messages = []
+        with open(self.path, encoding="utf-8") as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    messages.append(Message.model_validate_json(line))
+                except ValueError:
+                    # A torn line from a crash mid-write; the lines around it are intact
+                    continue
+        return messages
+
+    def compact(self) -> List[dict]:
+        messages_json = [
+            message.model_dump(exclude_unset=True, exclude_none=True)
+            for message in self.load()
+        ]
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.json_path + ".tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump(messages_json, fp, indent=4)
+        os.replace(tmp_path, self.json_path)
+        return messages_json
+
+    def close(self):
+        if self.fp is not None:
+            self.fp.flush()
+            if self.fsync_policy == FsyncPolicy.ALWAYS:
+                os.fsync(self.fp.fileno())
+            self.fp.close()
+            self.fp = None
+
+    @classmethod
+    def resume(
+        cls,
+        conversation_id: str,
+        directory: Optional[str] = None,
+        fsync_policy: FsyncPolicy = FsyncPolicy.FLUSH,
+    ):
+        journal = cls(conversation_id, directory, fsync_policy)
+        if not os.path.exists(journal.path):
+            raise FileNotFoundError(f"No journal found at {journal.path}")
+        return journal, journal.load()
@@ -1,5 +1,6 @@
 from conversation import Conversation
 from openai_service import InterruptFlag
+from journal import FsyncPolicy
 import argparse
 import asyncio
 import signal
@@ -21,6 +22,11 @@ async def main():
         action="store_true",
         help="Include state data in initial system prompt",
     )
+    parser.add_argument(
+        "--outline",
+        action="store_true",
+        help="Include an outline of the project's classes and functions in the initial system prompt, a much smaller alternative to --state",
+    )
     parser.add_argument(
         "-r",
         "--return-mode",
@@ -33,6 +39,63 @@ async def main():
         action="store_true",
         help="Enable auto mode, wherein the Assistant will generate responses to itself automatically and always use the MetaTool"
     )
+    parser.add_argument(
+        "--resume",
+        metavar="CONVERSATION_ID",
+        default=None,
+        help="Resume the conversation journaled under conversations/<CONVERSATION_ID>.jsonl, appending the prompt as a new user message",
+    )
+    parser.add_argument(
+        "--fsync",
+        choices=[policy.value for policy in FsyncPolicy],
+        default=FsyncPolicy.FLUSH.value,
+        help="When to sync the conversation journal to disk: after every message (always), flush to the OS only (flush), or leave it buffered (never)",
+    )
+    parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        help="Execute tool calls without asking for approval",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of tool calls from one assistant turn to execute at the same time",
+    )
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Talk to the OpenAI API over HTTP/2 (requires the `h2` package)",
+    )
+    parser.add_argument(
+        "-m",
+        "--model",
+        default="gpt-4-1106-preview",
+        help="Chat completion model to use",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=None,
+        help="OpenAI-compatible API base URL (defaults to $OPENAI_BASE_URL, then https://api.openai.com/v1)",
+    )
+    parser.add_argument(
+        "--fallback-model",
+        default=None,
+        help="Model to switch to once retries against --model are exhausted",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Retries on 429/5xx responses and dropped connections before giving up",
+    )
+    parser.add_argument(
+        "--context-budget",
+        type=int,
+        default=None,
+        help="Maximum prompt size in tokens; older turns are summarized to stay under it (defaults to the model's context window)",
+    )
     args = parser.parse_args()
 
     # Prevent default asyncio CTRL+C handling so Conversation can handle it
@@ -1,5 +1,5 @@
 from typing import Optional, List, Dict
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 
 class FunctionCall(BaseModel):
@@ -41,3 +41,25 @@ class Message(BaseModel):
     tool_calls: Optional[List[ToolCall]] = None
     tool_call_id: Optional[str] = None
     name: Optional[str] = None
+
+    # JSON encoding sent to the API, cached because history is re-sent every turn
+    _encoded: Optional[bytes] = PrivateAttr(default=None)
+
+    def encoded(self) -> bytes:
+        # NOTE: in-place changes to nested tool_calls aren't seen; assign a new list instead
+        # Read the private dict directly, attribute access on private attrs is ~50x slower
+        encoded = self.__pydantic_private__["_encoded"]
+        if encoded is None:
+            encoded = self.model_dump_json(exclude_unset=True).encode()
+            self.__pydantic_private__["_encoded"] = encoded
+        return encoded
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if not name.startswith("_"):
+            self.__pydantic_private__["_encoded"] = None
+
+    def model_copy(self, *args, **kwargs):
+        copy = super().model_copy(*args, **kwargs)
+        copy.__pydantic_private__["_encoded"] = None
+        return copy
@@ -1,13 +1,21 @@
-from models import Message, StreamChunk, ToolCall
+from models import FunctionCall, Message, StreamChunk, ToolCall
+from context_budget import ContextBudgeter, estimate_tokens
 
-from pydantic import ValidationError
-from typing import List, Dict
+from email.utils import parsedate_to_datetime
+from typing import Callable, List, Dict, Optional, Tuple
 from rich import print
 import asyncio
+import random
 import httpx
 import json
+import time
+import re
 import os
 
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+# The characters that change brace depth or string state in streamed tool arguments
+JSON_STRUCTURE = re.compile(r'[{}"\\]')
+
 
 class StreamingInterruptedException(Exception):
     def ___init__(self, message):
@@ -32,37 +40,271 @@ class InterruptFlag:
         return self.user_input_interrupted
 
 
+def decode_stream_line(line: str, validate: bool = False) -> Tuple[Dict, Optional[str]]:
+    """Return the `(delta, finish_reason)` of the first choice in an SSE data line.
+
+    By default only the `choices[0]` path is pulled out of the decoded JSON;
+    with `validate=True` the whole chunk is validated as a `StreamChunk` first.
+    """
+    if validate:
+        choice = StreamChunk.model_validate_json(line).choices[0]
+        delta = choice.delta.model_dump(exclude_none=True) if choice.delta else {}
+        return delta, choice.finish_reason
+
+    choices = json.loads(line).get("choices")
+    if not choices:
+        return {}, None
+    choice = choices[0]
+    return choice.get("delta") or {}, choice.get("finish_reason")
+
+
+class RetryableResponseError(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers: httpx.Headers) -> Optional[float]:
+    # OpenAI sends retry-after-ms alongside the standard header
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+
+
+class ServiceMetrics:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.retries = 0
+        self.fallbacks = 0
+        self.failures = 0
+        # Seconds from sending a request to the end of a successful stream
+        self.latencies: List[float] = []
+
+    def summary(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "fallbacks": self.fallbacks,
+            "failures": self.failures,
+            "mean_latency": sum(self.latencies) / len(self.latencies)
+            if self.latencies
+            else None,
+        }
+
+
+class StreamAccumulator:
+    """Folds streamed deltas into a single assistant Message as they arrive.
+
+    Content fragments are collected in a list and joined once; tool call
+    fragments are keyed by their `index`, so nothing but the output itself is
+    retained and each delta costs O(1).
+    """
+
+    def __init__(self, on_tool_call: Optional[Callable[[ToolCall], None]] = None) -> None:
+        self.role = "assistant"
+        self.content_parts: List[str] = []
+        self.tool_calls: Dict[int, Dict] = {}
+        self.finish_reason: Optional[str] = None
+        # Called once per tool call as soon as its arguments are complete
+        self.on_tool_call = on_tool_call
+
+    def add_delta(self, delta: Dict):
+        # `delta` is the raw `choices[0].delta` object of a chunk
+        role = delta.get("role")
+        if role:
+            self.role = role
+        content = delta.get("content")
+        if content:
+            self.content_parts.append(content)
+        for tool_call in delta.get("tool_calls") or ():
+            function = tool_call.get("function") or {}
+            self.add_tool_call_fragment(
+                tool_call.get("index"),
+                tool_call.get("id"),
+                tool_call.get("type"),
+                function.get("name"),
+                function.get("arguments"),
+            )
+
+    def add_tool_call_fragment(
+        self,
+        index: Optional[int],
+        id: Optional[str] = None,
+        type: Optional[str] = None,
+        name: Optional[str] = None,
+        arguments: Optional[str] = None,
+    ):
+        if index is None:
+            # Without an index, fragments continue the most recent tool call
+            index = max(self.tool_calls) if self.tool_calls else 0
+        entry = self.tool_calls.get(index)
+        if entry is None:
+            # A new tool call starting means the earlier ones are finished
+            for earlier in self.tool_calls:
+                self.complete_tool_call(earlier)
+            entry = {
+                "id": None, "type": None, "name": None, "arguments": [], "complete": False,
+                # Scanner state for the arguments JSON
+                "depth": 0, "in_string": False, "escape": False,
+            }
+            self.tool_calls[index] = entry
+        if id:
+            entry["id"] = id
+        if type:
+            entry["type"] = type
+        if name:
+            entry["name"] = name
+        if arguments:
+            entry["arguments"].append(arguments)
+            # Only parse once the outermost brace closes, so long arguments aren't re-parsed per fragment
+            if self.on_tool_call and not entry["complete"] and self.closes_object(entry, arguments):
+                try:
+                    json.loads("".join(entry["arguments"]))
+                except ValueError:
+                    pass
+                else:
+                    self.complete_tool_call(index)
+
+    def closes_object(self, entry: Dict, fragment: str) -> bool:
+        """Advance the entry's brace depth over `fragment`; True if the outermost object closed."""
+        position = 0
+        if entry["escape"]:
+            # The previous fragment ended on a backslash inside a string
+            entry["escape"] = False
+            position = 1
+        while match := JSON_STRUCTURE.search(fragment, position):
+            char, position = match.group(), match.end()
+            if entry["in_string"]:
+                if char == "\\":
+                    if position == len(fragment):
+                        entry["escape"] = True
+                    position += 1
+                elif char == '"':
+                    entry["in_string"] = False
+            elif char == '"':
+                entry["in_string"] = True
+            elif char == "{":
+                entry["depth"] += 1
+            elif char == "}":
+                entry["depth"] -= 1
+                if entry["depth"] == 0:
+                    return True
+        return False
+
+    def complete_tool_call(self, index: int):
+        entry = self.tool_calls[index]
+        if entry["complete"]:
+            return
+        entry["complete"] = True
+        if self.on_tool_call and entry["name"]:
+            self.on_tool_call(self.build_tool_call(index, entry))
+
+    def build_tool_call(self, index: int, entry: Dict) -> ToolCall:
+        return ToolCall(
+            index=index,
+            id=entry["id"],
+            type=entry["type"],
+            function=FunctionCall(name=entry["name"], arguments="".join(entry["arguments"])),
+        )
+
+    def partial(self) -> str | List[Dict]:
+        if self.content_parts:
+            return "".join(self.content_parts)
+        return [
+            {"function_name": entry["name"], "args": "".join(entry["arguments"])}
+            for entry in self.tool_calls.values()
+        ]
+
+    def to_message(self) -> Message:
+        message = Message(role=self.role)
+        if self.content_parts:
+            message.content = "".join(self.content_parts)
+        if self.tool_calls:
+            message.tool_calls = [
+                self.build_tool_call(index, entry)
+                for index, entry in sorted(self.tool_calls.items())
+            ]
+        return message
+
+
 class OpenAIService:
-    def __init__(self, tools_json: List[Dict], flag: InterruptFlag, verbose=False):
+    def __init__(
+        self,
+        tools_json: List[Dict],
+        flag: InterruptFlag,
+        verbose=False,
+        validate_chunks=False,
+        client: Optional[httpx.AsyncClient] = None,
+        model: str = "gpt-4-1106-preview",
+        budgeter: Optional[ContextBudgeter] = None,
+        fallback_model: Optional[str] = None,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        max_retry_after: float = 120.0,
+        base_url: Optional[str] = None,
+    ):
         self.tools_json = tools_json
+        # Encoded once and spliced into every tools=True request body
+        self.tools_bytes = json.dumps(
+            tools_json, sort_keys=True, separators=(",", ":")
+        ).encode()
+        self.model = model
+        # Tried once retries against `model` are exhausted
+        self.fallback_model = fallback_model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Longest Retry-After worth waiting out; past it the model is given up on
+        self.max_retry_after = max_retry_after
+        self.metrics = ServiceMetrics()
+        # Trims history to the model's context window before each request
+        self.budgeter = budgeter or ContextBudgeter.for_model(model)
+        self.tools_tokens = estimate_tokens(self.tools_bytes.decode())
         self.flag = flag
         self.verbose = verbose
+        # Validate every chunk as a StreamChunk instead of only the final Message
+        self.validate_chunks = validate_chunks
         self.timeout = 300
 
-        self.client = httpx.AsyncClient()
+        self.client = client or httpx.AsyncClient()
         bearer_token = f"Bearer {os.getenv('OPENAI_API_KEY')}"
         self.headers = {
             "Authorization": bearer_token,
             "Content-Type": "application/json",
         }
-        self.url = "https://api.openai.com/v1/chat/completions"
-
-    async def get_message(self, messages: List[Message], tools: bool = False, force: bool = False):
-        payload = {
-            "messages": [
-                message.model_dump(exclude_unset=True) for message in messages
-            ],
-            "model": "gpt-4-1106-preview",
-            "stream": True,
-        }
-        if tools:
-            payload["tools"] = self.tools_json
-        if force:
-            payload["tool_choice"] = {"type": "function", "function": {"name": "MetaTool"}}
-
+        # Point at a proxy, a compatible API or the local mock server
+        self.base_url = (
+            base_url or os.getenv("OPENAI_BASE_URL") or DEFAULT_BASE_URL
+        ).rstrip("/")
+        self.url = f"{self.base_url}/chat/completions"
+
+    async def get_message(
+        self,
+        messages: List[Message],
+        tools: bool = False,
+        force: bool = False,
+        on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+    ):
+        messages = self.budgeter.fit(
+            messages, extra_tokens=self.tools_tokens if tools else 0
+        )
         try:
-            stream_chunks = await self.get_stream_chunks(payload)
-            message = self.parse_stream_chunks(stream_chunks)
+            message = await self.request_with_retries(
+                messages, tools, force, on_tool_call
+            )
         except StreamingInterruptedException as e:
             print(e)
             message = Message(role="assistant", content=str(e))
@@ -83,149 +325,152 @@ class OpenAIService:
             )
         return message
 
-    async def get_stream_chunks(self, payload: Dict) -> List[StreamChunk]:
+    async def request_with_retries(
+        self,
+        messages: List[Message],
+        tools: bool,
+        force: bool,
+        on_tool_call: Optional[Callable[[ToolCall], None]] = None,
+    ) -> Message:
+        models = [self.model] + ([self.fallback_model] if self.fallback_model else [])
+        attempts = 0
+        error = None
+        for model in models:
+            if model != self.model:
+                self.metrics.fallbacks += 1
+                print(f"Falling back to {model}")
+            body = self.build_body(messages, tools=tools, force=force, model=model)
+
+            for attempt in range(self.max_retries + 1):
+                self.metrics.requests += 1
+                attempts += 1
+                start = time.perf_counter()
+                try:
+                    message = await self.stream_message(body, on_tool_call)
+                    self.metrics.latencies.append(time.perf_counter() - start)
+                    return message
+                except (RetryableResponseError, httpx.TransportError) as e:
+                    # A partial reply is discarded and regenerated from scratch
+                    error = e
+                    retry_after = getattr(e, "retry_after", None)
+                if attempt == self.max_retries:
+                    break
+                if retry_after is not None and retry_after > self.max_retry_after:
+                    # Retrying any sooner would ignore the server, so move on instead
+                    print(f"\n{type(error).__name__}: {error}; server asked to wait {retry_after:.0f}s")
+                    break
+                delay = self.backoff_delay(attempt, retry_after)
+                self.metrics.retries += 1
+                print(f"\n{type(error).__name__}: {error}; retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        self.metrics.failures += 1
+        return Message(
+            role="assistant",
+            content=f"I'm sorry, the request failed after {attempts} attempts: {error}",
+        )
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            # The server's wait is honored in full, not capped at backoff_max
+            return max(retry_after, 0.0)
+        # Exponential backoff with "equal jitter": half fixed, half random
+        delay = min(self.backoff_base * 2**attempt, self.backoff_max)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def build_body(
+        self,
+        messages: List[Message],
+        tools: bool = False,
+        force: bool = False,
+        model: Optional[str] = None,
+    ) -> bytes:
+        # Splice each message's cached encoding into the body instead of re-dumping the history
+        payload = {"model": model or self.model, "stream": True}
+        if force:
+            payload["tool_choice"] = {"type": "function", "function": {"name": "MetaTool"}}
+
+        parts = [
+            b'{"messages":[',
+            b",".join(message.encoded() for message in messages),
+            b"],",
+        ]
+        if tools:
+            parts += [b'"tools":', self.tools_bytes, b","]
+        parts.append(json.dumps(payload).encode()[1:])
+        return b"".join(parts)
+
+    async def stream_message(
+        self, body: bytes, on_tool_call: Optional[Callable[[ToolCall], None]] = None
+    ) -> Message:
         print("Assistant: ", end="")
-        chunks = []
+        accumulator = StreamAccumulator(on_tool_call)
         bad_status_code = False
-        partial_content = ""
-        partial_tool_calls = []
 
         async with self.client.stream(
-            "POST", self.url, json=payload, headers=self.headers, timeout=300
+            "POST", self.url, content=body, headers=self.headers, timeout=300
         ) as response:
             if response.status_code != 200:
                 bad_status_code = True
                 await response.aread()
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise RetryableResponseError(
+                        f"Got status code {response.status_code}: {response.text[:500]}",
+                        parse_retry_after(response.headers),
+                    )
 
             if not bad_status_code:
                 self.flag.set_streaming_interrupt(False)
 
                 async for line in response.aiter_lines():
-                    # print(line, flush=True)
-
                     trim_line = line[6:]
 
                     if trim_line and not self.flag.get_streaming_interrupt():
+                        if trim_line == "[DONE]":
+                            if self.verbose:
+                                print(f"Finished consuming stream.")
+                            continue
+
                         try:
-                            line_json = json.loads(trim_line)
-
-                            try:
-                                stream_chunk = StreamChunk.model_validate(line_json)
-
-                                content = stream_chunk.choices[0].delta.content
-                                if content:
-                                    partial_content += content
-                                    print(content, end="")
-
-                                tool_calls = stream_chunk.choices[0].delta.tool_calls
-                                if tool_calls:
-                                    tool_call_function = tool_calls[0].function
-                                    if tool_call_function.name:
-                                        partial_tool_calls.append(
-                                            {
-                                                "function_name": tool_call_function.name,
-                                                "args": "",
-                                            }
-                                        )
-                                        print(f"{tool_call_function}: ", end="")
-                                    if tool_call_function.arguments:
-                                        print(tool_call_function.arguments, end="")
-                                        partial_tool_calls[-1][
-                                            "args"
-                                        ] += tool_call_function.arguments
-
-                                chunks.append(stream_chunk)
-                                if self.verbose:
-                                    print(stream_chunk)
-
-                            except ValidationError as e:
-                                if self.verbose:
-                                    print(f"ValidationError parsing {line_json}: {e}")
-
-                            # print(json.dumps(line_json, indent=4), flush=True)
-
-                        except json.JSONDecodeError:
-                            if trim_line == "[DONE]":
-                                if self.verbose:
-                                    print(f"Finished consuming stream.")
-                            else:
-                                if self.verbose:
-                                    print(f"Got JSON decode error on line: {trim_line}")
+                            delta, finish_reason = decode_stream_line(
+                                trim_line, validate=self.validate_chunks
+                            )
+                        except (ValueError, LookupError, AttributeError) as e:
+                            # ValidationError and JSONDecodeError are both ValueErrors
+                            if self.verbose:
+                                print(f"Got error decoding line {trim_line}: {e}")
+                            continue
+
+                        if self.verbose:
+                            print(delta)
+
+                        content = delta.get("content")
+                        if content:
+                            print(content, end="")
+                        for tool_call in delta.get("tool_calls") or ():
+                            function = tool_call.get("function") or {}
+                            if function.get("name"):
+                                print(f"{function['name']}: ", end="")
+                            if function.get("arguments"):
+                                print(function["arguments"], end="")
+
+                        accumulator.add_delta(delta)
+                        if finish_reason:
+                            accumulator.finish_reason = finish_reason
 
                     if self.flag.get_streaming_interrupt():
                         raise StreamingInterruptedException(
-                            f"Streaming interrupted: received CTRL+C from user. Partial content: {partial_content if partial_content else partial_tool_calls}"
+                            f"Streaming interrupted: received CTRL+C from user. Partial content: {accumulator.partial()}"
                         )
 
         if bad_status_code:
             print(
-                f"Got bad status code: {response.status_code}, {response.content=}\npayload: {json.dumps(payload, indent=4)}"
+                f"Got bad status code: {response.status_code}, {response.content=}\npayload: {json.dumps(json.loads(body), indent=4)}"
             )
+        elif accumulator.finish_reason is None:
+            # The connection closed before the model finished
+            raise RetryableResponseError("Stream ended before a finish_reason was received")
 
         print("")
 
-        return chunks
-
-    def parse_stream_chunks(self, chunks: List[StreamChunk]) -> Message:
-        # Initialize empty Message object
-        message = Message(role="assistant")
-
-        # Initialize empty content string and tool_calls list
-        content = ""
-        tool_calls: List[ToolCall] = []
-
-        # We will track whether we are inside a tool call or not
-        inside_tool_call = False
-
-        if chunks:
-            first_choice = chunks[0].choices[0]
-            if first_choice.delta.role == "assistant" and first_choice.delta.tool_calls:
-                tool_calls.append(first_choice.delta.tool_calls[0])
-                inside_tool_call = True
-
-        for chunk in chunks:
-            # Assume that we only care about the first choice in each chunk
-            choice = chunk.choices[0]
-            delta = choice.delta
-
-            if (
-                delta.role == "assistant"
-                and delta.content is None
-                and delta.tool_calls is None
-            ):
-                # The beginning of either text response or tool call sequence
-                continue
-            elif delta.role is None and delta.content is not None:
-                # Accumulate the text response content
-                content += delta.content
-            elif delta.role is None and delta.tool_calls:
-                # Handle the tool call sequence
-                for tool_call in delta.tool_calls:
-                    # If we encounter a new full ToolCall object, we are starting a new tool call
-                    if tool_call.id:
-                        tool_calls.append(tool_call)
-                        inside_tool_call = True
-
-                    elif inside_tool_call:
-                        # We are in the middle of processing a tool call, so we accumulate argument data
-                        # NOTE: This assumes that `arguments` are being sent in the correct sequence
-                        last_tool_call = tool_calls[-1]
-                        if last_tool_call.function.arguments is None:
-                            last_tool_call.function.arguments = ""
-                        last_tool_call.function.arguments += (
-                            tool_call.function.arguments
-                        )
-
-            elif choice.finish_reason == "stop":
-                # End of a text response sequence
-                break
-            elif choice.finish_reason == "tool_calls":
-                # End of a tool call sequence
-                break
-
-        if content:
-            message.content = content
-        else:
-            message.tool_calls = tool_calls
-
-        return message
+        return accumulator.to_message()
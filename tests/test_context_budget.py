@@ -0,0 +1,101 @@
+from context_budget import ContextBudgeter, estimate_tokens, MODEL_CONTEXT_WINDOWS
+from models import Message, ToolCall, FunctionCall
+
+
+def make_history(turns, content_size=400):
+    messages = [Message(role="system", content="system prompt")]
+    for i in range(turns):
+        messages.append(Message(role="user", content=f"question {i} " + "q" * content_size))
+        messages.append(
+            Message(
+                role="assistant",
+                tool_calls=[
+                    ToolCall(
+                        index=0,
+                        id=f"call_{i}",
+                        type="function",
+                        function=FunctionCall(name="ShellTool", arguments="{}"),
+                    )
+                ],
+            )
+        )
+        messages.append(
+            Message(role="tool", content="o" * content_size, tool_call_id=f"call_{i}", name="ShellTool")
+        )
+    return messages
+
+
+def test_small_history_unchanged():
+    budgeter = ContextBudgeter.for_model("gpt-4-1106-preview")
+    messages = make_history(3)
+    assert budgeter.fit(messages) == messages
+    assert budgeter.max_tokens == MODEL_CONTEXT_WINDOWS["gpt-4-1106-preview"]
+
+
+def test_old_turns_collapsed_into_summary():
+    budgeter = ContextBudgeter(max_tokens=2_000, reserve_tokens=200, summary_tokens=300)
+    messages = make_history(20)
+
+    fitted = budgeter.fit(messages)
+
+    assert fitted[0] is messages[0]
+    assert fitted[1].role == "system"
+    assert fitted[1].content.startswith("Summary of earlier conversation")
+    assert "question 0" in fitted[1].content or "earlier messages omitted" in fitted[1].content
+    # The most recent messages are kept verbatim, starting at a turn boundary
+    assert fitted[-1] is messages[-1]
+    assert fitted[2].role != "tool"
+    assert sum(budgeter.tokens(m) for m in fitted) <= 2_000 - 200
+
+    # Same history, same summary object: the prompt prefix is stable across turns
+    assert budgeter.fit(messages)[1] is fitted[1]
+
+
+def test_oversized_tool_output_truncated_only_over_budget():
+    messages = make_history(1, content_size=10_000)
+    roomy = ContextBudgeter(max_tokens=100_000, max_tool_output_tokens=100)
+    assert roomy.fit(messages) == messages
+
+    budgeter = ContextBudgeter(max_tokens=5_000, reserve_tokens=200, max_tool_output_tokens=100)
+    fitted = budgeter.fit(messages)
+
+    tool_message = fitted[-1]
+    assert tool_message.tool_call_id == "call_0"
+    assert "characters of tool output omitted" in tool_message.content
+    assert estimate_tokens(tool_message.content) < 150
+    assert messages[-1].content == "o" * 10_000
+
+
+def test_window_never_starts_with_orphaned_tool_result():
+    budgeter = ContextBudgeter(max_tokens=1_000, reserve_tokens=100, summary_tokens=200)
+    messages = [
+        Message(role="system", content="system prompt"),
+        Message(role="user", content="run both"),
+        Message(
+            role="assistant",
+            tool_calls=[
+                ToolCall(index=i, id=f"c{i}", type="function", function=FunctionCall(name="ShellTool", arguments="{}"))
+                for i in range(2)
+            ],
+        ),
+        Message(role="tool", content="a" * 2_000, tool_call_id="c0", name="ShellTool"),
+        Message(role="tool", content="b" * 2_000, tool_call_id="c1", name="ShellTool"),
+    ]
+
+    fitted = budgeter.fit(messages)
+
+    assert [m.role for m in fitted] == ["system", "system", "assistant", "tool", "tool"]
+    assert fitted[2] is messages[2]
+
+
+def test_truncation_follows_dense_content(monkeypatch):
+    # One token per character, like minified JSON can come close to
+    monkeypatch.setattr("context_budget.estimate_tokens", lambda text: len(text or ""))
+    budgeter = ContextBudgeter(max_tokens=2_000, reserve_tokens=100, max_tool_output_tokens=1_000)
+    messages = make_history(1, content_size=3_000)
+
+    tool_message = budgeter.fit(messages)[-1]
+
+    assert len(tool_message.content) < 1_100
+    assert "2000 characters of tool output omitted" in tool_message.content
+    assert tool_message.content.startswith("o" * 500)
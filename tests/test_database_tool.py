@@ -102,3 +102,146 @@ async def test_drop_table():
     )
     result = await db_tool.execute(input_data)
     assert "DROP TABLE" in result
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.getenv('SKIP_DB_TESTS', 'false').lower() == 'true',
+                    reason="Skipping DatabaseTool tests in CI/CD environment")
+async def test_pool_reused_across_calls():
+    toolkit = ToolKit()
+    db_tool = DatabaseTool(toolkit)
+    input_data = DatabaseToolInput(
+        dsn=DATABASE_URL,
+        operations=[DbOperation(type=DbType.QUERY, query="SELECT pg_backend_pid() AS pid")],
+    )
+    first = json.loads(await db_tool.execute(input_data))[0][0]["pid"]
+    second = json.loads(await db_tool.execute(input_data))[0][0]["pid"]
+    assert first == second
+    assert len(db_tool.pools) == 1
+
+    await db_tool.aclose()
+    assert not db_tool.pools
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.getenv('SKIP_DB_TESTS', 'false').lower() == 'true',
+                    reason="Skipping DatabaseTool tests in CI/CD environment")
+async def test_bulk_operations_in_transaction():
+    toolkit = ToolKit()
+    db_tool = DatabaseTool(toolkit)
+    input_data = DatabaseToolInput(
+        dsn=DATABASE_URL,
+        transaction=True,
+        operations=[
+            DbOperation(
+                type=DbType.CREATE_TABLE,
+                query="CREATE TABLE IF NOT EXISTS bulk_table (id int PRIMARY KEY, data text)",
+            ),
+            DbOperation(
+                type=DbType.EXECUTEMANY,
+                query="INSERT INTO bulk_table (id, data) VALUES ($1, $2)",
+                parameters_list=[[i, f"row {i}"] for i in range(100)],
+            ),
+            DbOperation(
+                type=DbType.COPY,
+                table_name="bulk_table",
+                columns=["id", "data"],
+                records=[[i, f"row {i}"] for i in range(100, 1100)],
+            ),
+            DbOperation(type=DbType.QUERY, query="SELECT count(*) AS n FROM bulk_table"),
+            DbOperation(type=DbType.DROP_TABLE, query="DROP TABLE bulk_table"),
+        ],
+    )
+    results = json.loads(await db_tool.execute(input_data))
+    assert results[1] == "EXECUTEMANY 100"
+    assert results[2] == "COPY 1000"
+    assert results[3][0]["n"] == 1100
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.getenv('SKIP_DB_TESTS', 'false').lower() == 'true',
+                    reason="Skipping DatabaseTool tests in CI/CD environment")
+async def test_transaction_rolled_back_on_failure():
+    toolkit = ToolKit()
+    db_tool = DatabaseTool(toolkit)
+    await db_tool.execute(
+        DatabaseToolInput(
+            dsn=DATABASE_URL,
+            operations=[
+                DbOperation(
+                    type=DbType.CREATE_TABLE,
+                    query="CREATE TABLE IF NOT EXISTS rollback_table (id int PRIMARY KEY)",
+                )
+            ],
+        )
+    )
+    result = await db_tool.execute(
+        DatabaseToolInput(
+            dsn=DATABASE_URL,
+            transaction=True,
+            operations=[
+                DbOperation(type=DbType.INSERT, query="INSERT INTO rollback_table VALUES (1)"),
+                DbOperation(type=DbType.INSERT, query="INSERT INTO rollback_table VALUES (1)"),
+            ],
+        )
+    )
+    assert "rolled back" in result
+
+    result = await db_tool.execute(
+        DatabaseToolInput(
+            dsn=DATABASE_URL,
+            operations=[
+                DbOperation(type=DbType.QUERY, query="SELECT count(*) AS n FROM rollback_table"),
+                DbOperation(type=DbType.DROP_TABLE, query="DROP TABLE rollback_table"),
+            ],
+        )
+    )
+    assert json.loads(result)[0][0]["n"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.getenv('SKIP_DB_TESTS', 'false').lower() == 'true',
+                    reason="Skipping DatabaseTool tests in CI/CD environment")
+async def test_query_row_cap_columnar():
+    toolkit = ToolKit()
+    db_tool = DatabaseTool(toolkit)
+    input_data = DatabaseToolInput(
+        dsn=DATABASE_URL,
+        operations=[
+            DbOperation(
+                type=DbType.QUERY,
+                query="SELECT i AS id, 'row ' || i AS data FROM generate_series(1, 5000) AS i",
+                max_rows=10,
+                result_format="columnar",
+            )
+        ],
+    )
+    result = json.loads(await db_tool.execute(input_data))[0]
+    assert result["columns"] == ["id", "data"]
+    assert result["rows"][0] == [1, "row 1"]
+    assert len(result["rows"]) == 10
+    assert result["row_count"] == 5000
+    assert result["truncated"] is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(os.getenv('SKIP_DB_TESTS', 'false').lower() == 'true',
+                    reason="Skipping DatabaseTool tests in CI/CD environment")
+async def test_query_byte_cap_records():
+    toolkit = ToolKit()
+    db_tool = DatabaseTool(toolkit)
+    input_data = DatabaseToolInput(
+        dsn=DATABASE_URL,
+        operations=[
+            DbOperation(
+                type=DbType.QUERY,
+                query="SELECT repeat('x', 1000) AS data FROM generate_series(1, 100)",
+                max_bytes=5000,
+            )
+        ],
+    )
+    result = json.loads(await db_tool.execute(input_data))[0]
+    assert result["truncated"] is True
+    assert result["returned_rows"] == 4
+    assert result["row_count"] == 100
+    assert result["records"][0]["data"] == "x" * 1000
@@ -1,7 +1,9 @@
-from tools.file_tool import FileTool, FileToolInput, FileOperation, FileOperationType
+from tools.file_tool import UMASK, FileTool, FileToolInput, FileOperation, FileOperationType
+from models import FunctionCall, ToolCall
 from toolkit import ToolKit
 
 import pytest
+import json
 import os
 from pathlib import Path
 
@@ -34,3 +36,247 @@ async def test_file_tool_create_delete_file(tmp_path):
     result = await tool.execute(input_data)
 
     assert not Path(file_path).exists()
+
+
+def line_op(operation_type, path, line_number, content=None):
+    return FileOperation(
+        operation_type=operation_type, path=str(path), line_number=line_number, content=content
+    )
+
+
+@pytest.mark.asyncio
+async def test_line_numbers_refer_to_original_file(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_text("a\nb\nc\nd\n")
+    tool = FileTool(ToolKit())
+
+    result = await tool.execute(
+        FileToolInput(
+            operations=[
+                line_op(FileOperationType.INSERT_LINE, path, 0, "first"),
+                line_op(FileOperationType.DELETE_LINE, path, 1),
+                line_op(FileOperationType.UPDATE_LINE, path, 2, "C"),
+                line_op(FileOperationType.INSERT_LINE, path, 2, "before c"),
+                line_op(FileOperationType.INSERT_LINE, path, 2, "also before c"),
+                line_op(FileOperationType.INSERT_LINE, path, 4, "appended"),
+            ]
+        )
+    )
+
+    assert result == "File operations executed successfully."
+    assert path.read_text() == "first\na\nbefore c\nalso before c\nC\nd\nappended\n"
+
+
+@pytest.mark.asyncio
+async def test_file_read_and_written_once(tmp_path, monkeypatch):
+    path = tmp_path / "big.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(1000)))
+    tool = FileTool(ToolKit())
+    reads, replaces = [], []
+    original_read_text = Path.read_text
+    original_replace = os.replace
+    monkeypatch.setattr(Path, "read_text", lambda self, *a, **k: reads.append(self) or original_read_text(self, *a, **k))
+    monkeypatch.setattr(os, "replace", lambda *a: replaces.append(a) or original_replace(*a))
+
+    await tool.execute(
+        FileToolInput(
+            operations=[line_op(FileOperationType.UPDATE_LINE, path, i, f"edited {i}") for i in range(0, 1000, 10)]
+        )
+    )
+
+    assert len(reads) == 1
+    assert len(replaces) == 1
+    lines = path.read_text().splitlines()
+    assert lines[10] == "edited 10" and lines[11] == "line 11"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+@pytest.mark.asyncio
+async def test_invalid_batch_changes_nothing(tmp_path):
+    first = tmp_path / "first.txt"
+    second = tmp_path / "second.txt"
+    first.write_text("one\n")
+    second.write_text("two\n")
+    tool = FileTool(ToolKit())
+
+    result = await tool.execute(
+        FileToolInput(
+            operations=[
+                line_op(FileOperationType.UPDATE_LINE, first, 0, "changed"),
+                line_op(FileOperationType.DELETE_LINE, second, 5),
+            ]
+        )
+    )
+
+    assert result.startswith("Error in operation 1 (DELETE_LINE")
+    assert "out of range" in result
+    assert first.read_text() == "one\n"
+    assert second.read_text() == "two\n"
+
+
+@pytest.mark.asyncio
+async def test_create_then_edit_in_one_call(tmp_path):
+    path = tmp_path / "new.txt"
+    tool = FileTool(ToolKit())
+
+    await tool.execute(
+        FileToolInput(
+            operations=[
+                FileOperation(operation_type=FileOperationType.CREATE, path=str(path), content="x\ny"),
+                line_op(FileOperationType.INSERT_LINE, path, 1, "between"),
+            ]
+        )
+    )
+
+    assert path.read_text() == "x\nbetween\ny"
+
+
+@pytest.mark.asyncio
+async def test_read_range_by_line_and_byte(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("".join(f"entry {i}\n" for i in range(100_000)))
+    tool = FileTool(ToolKit())
+
+    result = await tool.execute(
+        FileToolInput(
+            operations=[
+                FileOperation(operation_type=FileOperationType.READ_RANGE, path=str(path), line_number=99_998, end_line=200_000),
+                FileOperation(operation_type=FileOperationType.READ_RANGE, path=str(path), byte_offset=8, byte_count=7),
+            ]
+        )
+    )
+
+    by_line, by_byte = result.split("\n\n")
+    assert by_line == f"--- {path} lines 99998-100000 ---\n 99998  entry 99998\n 99999  entry 99999"
+    assert by_byte == f"--- {path} bytes 8-15 ---\nentry 1"
+
+
+@pytest.mark.asyncio
+async def test_reads_see_pending_edits(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_text("a\nb\nc\n")
+    tool = FileTool(ToolKit())
+
+    result = await tool.execute(
+        FileToolInput(
+            operations=[
+                line_op(FileOperationType.INSERT_LINE, path, 0, "new"),
+                FileOperation(operation_type=FileOperationType.READ_RANGE, path=str(path), line_number=0, end_line=2),
+                # After the read, line numbers refer to what it showed
+                line_op(FileOperationType.UPDATE_LINE, path, 1, "A"),
+            ]
+        )
+    )
+
+    assert result == f"File operations executed successfully.\n\n--- {path} lines 0-2 ---\n     0  new\n     1  a"
+    assert path.read_text() == "new\nA\nb\nc\n"
+
+
+@pytest.mark.asyncio
+async def test_search_with_context(tmp_path):
+    (tmp_path / "one.py").write_text("import os\n\n\ndef main():\n    os.getcwd()\n")
+    (tmp_path / "two.py").write_text("x = 1\n")
+    tool = FileTool(ToolKit())
+
+    result = await tool.execute(
+        FileToolInput(
+            operations=[
+                FileOperation(
+                    operation_type=FileOperationType.SEARCH, path=str(tmp_path), pattern=r"\bos\b", context_lines=1
+                )
+            ]
+        )
+    )
+
+    one = tmp_path / "one.py"
+    assert result.splitlines() == [
+        f"--- search '\\\\bos\\\\b' in {tmp_path}: 2 matches ---",
+        f"{one}:0:import os",
+        f"{one}-1-",
+        "--",
+        f"{one}-3-def main():",
+        f"{one}:4:    os.getcwd()",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_apply_patch(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text("# header\n\ndef f():\n    return 1\n\n\ndef g():\n    return 2\n")
+    tool = FileTool(ToolKit())
+    # Made against a version of the file without the header comment, so both hunks are offset
+    patch = (
+        "--- a/module.py\n+++ b/module.py\n"
+        "@@ -1,2 +1,2 @@\n def f():\n-    return 1\n+    return 10\n"
+        "@@ -5,2 +5,3 @@\n def g():\n-    return 2\n+    # doubled\n+    return 4\n"
+    )
+
+    result = await tool.execute(
+        FileToolInput(operations=[FileOperation(operation_type=FileOperationType.APPLY_PATCH, path=str(path), content=patch)])
+    )
+
+    assert result == "File operations executed successfully."
+    assert path.read_text() == "# header\n\ndef f():\n    return 10\n\n\ndef g():\n    # doubled\n    return 4\n"
+
+    result = await tool.execute(
+        FileToolInput(operations=[FileOperation(operation_type=FileOperationType.APPLY_PATCH, path=str(path), content=patch)])
+    )
+    assert result.startswith("Error in operation 0 (APPLY_PATCH")
+    assert "hunk 1" in result and "does not match" in result
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_on_one_file_keep_every_edit(tmp_path):
+    path = tmp_path / "shared.txt"
+    path.write_text("".join(f"line {i}\n" for i in range(10_000)))
+    toolkit = ToolKit(auto_approve=True)
+    toolkit.tools["FileTool"] = FileTool(toolkit)
+    tool_calls = [
+        ToolCall(
+            index=i,
+            id=f"call_{i}",
+            type="function",
+            function=FunctionCall(
+                name="FileTool",
+                arguments=json.dumps(
+                    {"operations": [{"operation_type": "UPDATE_LINE", "path": str(path), "line_number": i, "content": f"EDIT {i}"}]}
+                ),
+            ),
+        )
+        for i in range(4)
+    ]
+
+    results = await toolkit.execute_tool_calls(tool_calls)
+    await toolkit.aclose()
+
+    assert results == ["File operations executed successfully."] * 4
+    assert path.read_text().splitlines()[:5] == ["EDIT 0", "EDIT 1", "EDIT 2", "EDIT 3", "line 4"]
+
+
+@pytest.mark.asyncio
+async def test_new_files_get_umask_mode(tmp_path):
+    path = tmp_path / "new.sh"
+    await FileTool(ToolKit()).execute(
+        FileToolInput(operations=[FileOperation(operation_type=FileOperationType.CREATE, path=str(path), content="echo hi\n")])
+    )
+
+    # Not mkstemp's 0600
+    assert path.stat().st_mode & 0o777 == 0o666 & ~UMASK
+
+
+@pytest.mark.asyncio
+async def test_spellings_of_one_path_share_pending_edits(tmp_path, monkeypatch):
+    (tmp_path / "a.txt").write_text("x\ny\n")
+    monkeypatch.chdir(tmp_path)
+
+    result = await FileTool(ToolKit()).execute(
+        FileToolInput(
+            operations=[
+                line_op(FileOperationType.UPDATE_LINE, "a.txt", 0, "X"),
+                line_op(FileOperationType.UPDATE_LINE, "./a.txt", 1, "Y"),
+            ]
+        )
+    )
+
+    assert result == "File operations executed successfully."
+    assert (tmp_path / "a.txt").read_text() == "X\nY\n"
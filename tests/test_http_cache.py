@@ -0,0 +1,124 @@
+from http_cache import ResponseCache
+
+import pytest
+import httpx
+
+
+def mock_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_fresh_response_served_from_cache(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, text="cached body", headers={"Cache-Control": "max-age=60"})
+
+    cache = ResponseCache(directory=str(tmp_path))
+    async with mock_client(handler) as client:
+        first = await cache.get(client, "https://a.test/page")
+        second = await cache.get(client, "https://a.test/page")
+
+    assert len(requests) == 1
+    assert first.text == second.text == "cached body"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    # A new cache over the same directory picks up the persisted index
+    reloaded = ResponseCache(directory=str(tmp_path))
+    async with mock_client(handler) as client:
+        third = await reloaded.get(client, "https://a.test/page")
+    assert len(requests) == 1
+    assert third.text == "cached body"
+
+
+@pytest.mark.asyncio
+async def test_etag_revalidation(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, text="body v1", headers={"ETag": '"v1"'})
+
+    cache = ResponseCache(directory=str(tmp_path))
+    async with mock_client(handler) as client:
+        await cache.get(client, "https://a.test/page")
+        response = await cache.get(client, "https://a.test/page")
+
+    assert len(requests) == 2
+    assert response.status_code == 200
+    assert response.text == "body v1"
+    assert cache.stats()["revalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_no_store_and_vary_headers(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path == "/private":
+            return httpx.Response(200, text="secret", headers={"Cache-Control": "no-store"})
+        return httpx.Response(
+            200, text=request.headers.get("accept", ""), headers={"Cache-Control": "max-age=60"}
+        )
+
+    cache = ResponseCache(directory=str(tmp_path))
+    async with mock_client(handler) as client:
+        await cache.get(client, "https://a.test/private")
+        await cache.get(client, "https://a.test/private")
+        json_response = await cache.get(client, "https://a.test/data", headers={"Accept": "application/json"})
+        html_response = await cache.get(client, "https://a.test/data", headers={"Accept": "text/html"})
+
+    assert len(requests) == 4
+    assert json_response.text == "application/json"
+    assert html_response.text == "text/html"
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction(tmp_path):
+    def handler(request):
+        return httpx.Response(200, text=request.url.path * 200, headers={"Cache-Control": "max-age=60"})
+
+    cache = ResponseCache(directory=str(tmp_path), max_bytes=1000)
+    async with mock_client(handler) as client:
+        await cache.get(client, "https://a.test/a")
+        await cache.get(client, "https://a.test/b")
+        # Touch /a so /b becomes the least recently used entry
+        await cache.get(client, "https://a.test/a")
+        await cache.get(client, "https://a.test/c")
+
+    assert cache.stats()["bytes"] <= 1000
+    assert cache.lookup(cache.key("GET", "https://a.test/a")) is not None
+    assert cache.lookup(cache.key("GET", "https://a.test/b")) is None
+    assert len(list((tmp_path / "bodies").iterdir())) == 2
+
+
+@pytest.mark.asyncio
+async def test_hits_do_not_rewrite_index_until_flush(tmp_path, monkeypatch):
+    def handler(request):
+        return httpx.Response(200, text="body", headers={"Cache-Control": "max-age=60"})
+
+    cache = ResponseCache(directory=str(tmp_path))
+    async with mock_client(handler) as client:
+        await cache.get(client, "https://a.test/a")
+        await cache.get(client, "https://a.test/b")
+        saves = []
+        original_save = cache.save
+        monkeypatch.setattr(cache, "save", lambda: saves.append(1) or original_save())
+        for _ in range(5):
+            await cache.get(client, "https://a.test/a")
+
+    assert cache.stats()["hits"] == 5
+    assert saves == []
+    cache.flush()
+    assert saves == [1]
+
+    # The flushed index remembers that /a was used last
+    reloaded = ResponseCache(directory=str(tmp_path))
+    reloaded.load()
+    assert list(reloaded.entries)[-1] == cache.key("GET", "https://a.test/a")
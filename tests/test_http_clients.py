@@ -0,0 +1,34 @@
+from http_clients import HttpClientRegistry
+from toolkit import ToolKit
+
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_named_clients():
+    registry = HttpClientRegistry()
+    default = registry.get()
+    assert registry.get() is default
+    assert registry.get("openai") is not default
+
+    await registry.aclose()
+    assert default.is_closed
+    assert registry.get() is not default
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_registry_http2_falls_back_without_h2(monkeypatch):
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+    registry = HttpClientRegistry()
+    client = registry.get("openai", http2=True)
+    assert client is registry.get("openai")
+    await registry.aclose()
+
+
+@pytest.mark.asyncio
+async def test_toolkit_tools_share_client():
+    toolkit = ToolKit()
+    client = toolkit.http_clients.get()
+    await toolkit.aclose()
+    assert client.is_closed
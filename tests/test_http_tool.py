@@ -1,7 +1,10 @@
 from tools.http_tool import HttpTool, HttpToolInput, HttpRequest, HttpRequestType
+from http_cache import ResponseCache
 from toolkit import ToolKit
 
+import hashlib
 import pytest
+import httpx
 import json
 
 
@@ -38,3 +41,95 @@ async def test_http_tool_post_request():
 
     assert isinstance(result, str)
     assert result_json["json"]["key"] == "value"
+
+
+def mock_toolkit(tmp_path, handler):
+    toolkit = ToolKit()
+    toolkit.http_clients.clients["default"] = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler)
+    )
+    toolkit.http_cache = ResponseCache(directory=str(tmp_path / "cache"))
+    return toolkit
+
+
+@pytest.mark.asyncio
+async def test_http_tool_truncates_large_text(tmp_path):
+    def handler(request):
+        return httpx.Response(200, text="a" * 10_000, headers={"Content-Type": "text/plain"})
+
+    toolkit = mock_toolkit(tmp_path, handler)
+    tool = HttpTool(toolkit)
+    request = HttpRequest(request_type=HttpRequestType.GET, url="https://a.test/big", max_bytes=100)
+    result = json.loads(await tool.execute(HttpToolInput(requests=[request])))[0]
+
+    assert result.startswith("a" * 100 + "\n[... truncated, body is 10000 bytes")
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http_tool_binary_and_spill_to_file(tmp_path):
+    payload = bytes(range(256)) * 100
+
+    def handler(request):
+        return httpx.Response(200, content=payload, headers={"Content-Type": "application/octet-stream"})
+
+    toolkit = mock_toolkit(tmp_path, handler)
+    tool = HttpTool(toolkit)
+    path = tmp_path / "downloads" / "blob.bin"
+    requests = [
+        HttpRequest(request_type=HttpRequestType.GET, url="https://a.test/blob"),
+        HttpRequest(request_type=HttpRequestType.GET, url="https://a.test/blob", save_to=str(path)),
+    ]
+    described, spilled = json.loads(await tool.execute(HttpToolInput(requests=requests)))
+
+    assert described["content_type"] == "application/octet-stream"
+    assert "save_to" in described["note"]
+    assert spilled["size"] == len(payload)
+    assert spilled["sha256"] == hashlib.sha256(payload).hexdigest()
+    assert path.read_bytes() == payload
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http_tool_serves_repeated_get_from_cache(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"n": len(calls)}, headers={"Cache-Control": "max-age=60"})
+
+    toolkit = mock_toolkit(tmp_path, handler)
+    tool = HttpTool(toolkit)
+    request = HttpRequest(request_type=HttpRequestType.GET, url="https://a.test/api")
+    first = await tool.execute(HttpToolInput(requests=[request]))
+    second = await tool.execute(HttpToolInput(requests=[request]))
+
+    assert len(calls) == 1
+    assert json.loads(json.loads(second)[0]) == {"n": 1} == json.loads(json.loads(first)[0])
+    assert toolkit.http_cache.stats()["hits"] == 1
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_http_tool_honors_request_cache_control(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, text=f"v{len(calls)}", headers={"Cache-Control": "max-age=600"})
+
+    toolkit = mock_toolkit(tmp_path, handler)
+    tool = HttpTool(toolkit)
+
+    async def get(**headers):
+        request = HttpRequest(request_type=HttpRequestType.GET, url="https://a.test/page", headers=headers)
+        return json.loads(await tool.execute(HttpToolInput(requests=[request])))[0]
+
+    assert await get() == "v1"
+    assert await get(**{"Cache-Control": "no-cache"}) == "v2"
+    assert await get(**{"Cache-Control": "no-store"}) == "v3"
+    assert len(calls) == 3
+    # no-cache refreshed the stored copy, no-store left it alone
+    assert await get() == "v2"
+    assert len(calls) == 3
+    await toolkit.aclose()
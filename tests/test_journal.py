@@ -0,0 +1,64 @@
+from journal import ConversationJournal, FsyncPolicy
+from models import Message, ToolCall, FunctionCall
+
+import json
+import os
+
+
+def test_journal_append_and_load(tmp_path):
+    journal = ConversationJournal("test", directory=str(tmp_path))
+    journal.append(Message(role="system", content="system prompt"))
+    journal.append(Message(role="user", content="hello"))
+
+    lines = open(journal.path).read().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[1]) == {"role": "user", "content": "hello"}
+
+    messages = journal.load()
+    assert [m.content for m in messages] == ["system prompt", "hello"]
+    journal.close()
+
+
+def test_journal_compact_writes_json_view(tmp_path):
+    journal = ConversationJournal(
+        "test", directory=str(tmp_path), fsync_policy=FsyncPolicy.NEVER
+    )
+    journal.append(Message(role="user", content="hello"))
+    journal.append(
+        Message(
+            role="assistant",
+            tool_calls=[
+                ToolCall(
+                    index=0,
+                    id="call_1",
+                    type="function",
+                    function=FunctionCall(name="SnapTool", arguments="{}"),
+                )
+            ],
+        )
+    )
+
+    messages_json = journal.compact()
+    journal.close()
+
+    assert json.load(open(os.path.join(tmp_path, "test.json"))) == messages_json
+    assert messages_json[1]["tool_calls"][0]["function"]["name"] == "SnapTool"
+
+
+def test_journal_resume_skips_torn_line(tmp_path):
+    journal = ConversationJournal(
+        "test", directory=str(tmp_path), fsync_policy=FsyncPolicy.ALWAYS
+    )
+    journal.append(Message(role="user", content="first"))
+    journal.close()
+
+    # Simulate a crash in the middle of writing the second message
+    with open(journal.path, "a") as fp:
+        fp.write('{"role": "assistant", "cont')
+
+    resumed, messages = ConversationJournal.resume("test", directory=str(tmp_path))
+    assert [m.content for m in messages] == ["first"]
+
+    resumed.append(Message(role="user", content="second"))
+    assert [m.content for m in resumed.load()] == ["first", "second"]
+    resumed.close()
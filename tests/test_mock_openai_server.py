@@ -0,0 +1,75 @@
+from benchmarks.mock_openai_server import MockOpenAIServer
+from openai_service import InterruptFlag, OpenAIService
+from models import Message
+
+import pytest
+import httpx
+
+
+def make_service(server, **kwargs):
+    return OpenAIService(
+        [], InterruptFlag(), client=httpx.AsyncClient(), base_url=server.base_url,
+        backoff_base=0.001, **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_replays_text_recording():
+    async with MockOpenAIServer() as server:
+        service = make_service(server)
+        message = await service.get_message([Message(role="user", content="hello")])
+        await service.client.aclose()
+
+    assert message.content.startswith("Sure! Here is a short summary")
+    assert server.requests[0]["messages"] == [{"role": "user", "content": "hello"}]
+
+
+@pytest.mark.asyncio
+async def test_replays_tool_call_deltas():
+    async with MockOpenAIServer(default="tool_call") as server:
+        service = make_service(server)
+        message = await service.get_message(
+            [Message(role="user", content="run it")], tools=True
+        )
+        await service.client.aclose()
+
+    assert [tc.function.name for tc in message.tool_calls] == ["ShellTool", "ShellTool"]
+    assert message.tool_calls[0].function.arguments == '{"commands": [{"command": "echo hello"}]}'
+    assert message.tool_calls[1].id == "call_Zp8mW1"
+
+
+@pytest.mark.asyncio
+async def test_retries_scripted_errors_and_disconnects():
+    async with MockOpenAIServer() as server:
+        server.script = [
+            {"status": 429, "headers": {"Retry-After": "0"}},
+            {"recording": "text", "drop_after": 5},
+            "text",
+        ]
+        service = make_service(server)
+        message = await service.get_message([Message(role="user", content="hello")])
+        await service.client.aclose()
+
+    assert message.content.startswith("Sure!")
+    assert len(server.requests) == 3
+    assert service.metrics.retries == 2
+
+
+@pytest.mark.asyncio
+async def test_token_rate_throttles_replay():
+    async with MockOpenAIServer(token_rate=1000) as server:
+        service = make_service(server)
+        await service.get_message([Message(role="user", content="hello")])
+        await service.client.aclose()
+
+    # 44 chunks at 1000/s take at least ~43ms
+    assert service.metrics.latencies[0] >= 0.04
+
+
+def test_base_url_from_environment(monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://localhost:9999/v1/")
+    service = OpenAIService([], InterruptFlag())
+    assert service.url == "http://localhost:9999/v1/chat/completions"
+
+    service = OpenAIService([], InterruptFlag(), base_url="http://other/v1")
+    assert service.url == "http://other/v1/chat/completions"
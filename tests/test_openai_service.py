@@ -0,0 +1,296 @@
+from openai_service import (
+    InterruptFlag,
+    OpenAIService,
+    StreamAccumulator,
+    decode_stream_line,
+    parse_retry_after,
+)
+from models import Message
+
+import pytest
+import httpx
+import json
+
+
+def make_line(delta, finish_reason=None):
+    return json.dumps(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4-1106-preview",
+            "system_fingerprint": "fp_1",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+    )
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_accumulator_content(validate):
+    accumulator = StreamAccumulator()
+    lines = [
+        make_line({"role": "assistant", "content": ""}),
+        make_line({"content": "Hello"}),
+        make_line({"content": ", world"}),
+        make_line({}, finish_reason="stop"),
+    ]
+    for line in lines:
+        delta, finish_reason = decode_stream_line(line, validate=validate)
+        accumulator.add_delta(delta)
+
+    assert finish_reason == "stop"
+    message = accumulator.to_message()
+    assert message.role == "assistant"
+    assert message.content == "Hello, world"
+    assert message.tool_calls is None
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_accumulator_interleaved_tool_calls(validate):
+    deltas = [
+        {"role": "assistant", "content": None, "tool_calls": [
+            {"index": 0, "id": "call_a", "type": "function", "function": {"name": "SnapTool", "arguments": ""}}
+        ]},
+        {"tool_calls": [{"index": 0, "function": {"arguments": '{"line_'}}]},
+        {"tool_calls": [{"index": 1, "id": "call_b", "type": "function", "function": {"name": "ShellTool", "arguments": ""}}]},
+        {"tool_calls": [{"index": 0, "function": {"arguments": 'numbers": true}'}}]},
+        {"tool_calls": [{"index": 1, "function": {"arguments": '{"commands": []}'}}]},
+    ]
+    accumulator = StreamAccumulator()
+    for delta in deltas:
+        accumulator.add_delta(decode_stream_line(make_line(delta), validate=validate)[0])
+
+    message = accumulator.to_message()
+    assert message.content is None
+    assert [tc.id for tc in message.tool_calls] == ["call_a", "call_b"]
+    assert message.tool_calls[0].function.arguments == '{"line_numbers": true}'
+    assert message.tool_calls[1].function.name == "ShellTool"
+    assert message.tool_calls[1].function.arguments == '{"commands": []}'
+
+
+def test_decode_stream_line_tolerates_missing_fingerprint():
+    line = json.dumps(
+        {"id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0,
+         "model": "gpt-4", "system_fingerprint": None,
+         "choices": [{"index": 0, "delta": {"content": "hi"}, "finish_reason": None}]}
+    )
+    assert decode_stream_line(line) == ({"content": "hi"}, None)
+    with pytest.raises(ValueError):
+        decode_stream_line(line, validate=True)
+
+
+def test_message_encoding_cached_until_mutation():
+    message = Message(role="assistant")
+    first = message.encoded()
+    assert message.encoded() is first
+    assert json.loads(first) == {"role": "assistant"}
+
+    message.content = "hello"
+    assert json.loads(message.encoded()) == {"role": "assistant", "content": "hello"}
+
+    copy = message.model_copy(update={"content": "changed"})
+    assert json.loads(copy.encoded())["content"] == "changed"
+    assert json.loads(message.encoded())["content"] == "hello"
+
+
+def test_build_body_matches_full_dump():
+    service = OpenAIService([{"type": "function", "function": {"name": "MetaTool"}}], InterruptFlag())
+    messages = [
+        Message(role="system", content="system prompt"),
+        Message(role="user", content="héllo \"quoted\"\n"),
+        Message(role="tool", content="[]", tool_call_id="call_1", name="ShellTool"),
+    ]
+
+    body = service.build_body(messages, tools=True, force=True)
+
+    assert json.loads(body) == {
+        "messages": [message.model_dump(exclude_unset=True) for message in messages],
+        "model": service.model,
+        "stream": True,
+        "tools": service.tools_json,
+        "tool_choice": {"type": "function", "function": {"name": "MetaTool"}},
+    }
+
+
+def sse_body(*texts, finish_reason="stop"):
+    lines = [make_line({"role": "assistant", "content": ""})]
+    lines += [make_line({"content": text}) for text in texts]
+    lines.append(make_line({}, finish_reason=finish_reason))
+    return "".join(f"data: {line}\n\n" for line in lines) + "data: [DONE]\n\n"
+
+
+def make_service(handler, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return OpenAIService([], InterruptFlag(), client=client, backoff_base=0.001, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_retries_rate_limit_honoring_retry_after():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"retry-after": "0"}, json={"error": "slow down"})
+        return httpx.Response(200, text=sse_body("Hi"))
+
+    service = make_service(handler)
+    message = await service.get_message([Message(role="user", content="hello")])
+
+    assert message.content == "Hi"
+    assert len(calls) == 2
+    assert service.metrics.retries == 1
+    assert service.metrics.requests == 2
+    assert len(service.metrics.latencies) == 1
+
+
+def test_retry_after_is_not_shortened():
+    service = make_service(lambda request: None, backoff_max=30.0)
+    assert service.backoff_delay(0, retry_after=60.0) == 60.0
+
+
+@pytest.mark.asyncio
+async def test_long_retry_after_moves_on_to_fallback():
+    models = []
+
+    def handler(request):
+        model = json.loads(request.content)["model"]
+        models.append(model)
+        if model == "primary":
+            return httpx.Response(429, headers={"retry-after": "3600"}, json={"error": "quota"})
+        return httpx.Response(200, text=sse_body("From fallback"))
+
+    service = make_service(handler, model="primary", fallback_model="secondary", max_retry_after=60.0)
+    message = await service.get_message([Message(role="user", content="hello")])
+
+    # No retries against primary inside the window it asked for
+    assert models == ["primary", "secondary"]
+    assert message.content == "From fallback"
+
+
+@pytest.mark.asyncio
+async def test_mid_stream_disconnect_restarts_reply():
+    calls = []
+
+    async def dropped_stream():
+        yield f"data: {make_line({'content': 'Partial'})}\n\n".encode()
+        raise httpx.RemoteProtocolError("peer closed connection")
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(200, content=dropped_stream())
+        return httpx.Response(200, text=sse_body("Complete"))
+
+    service = make_service(handler)
+    message = await service.get_message([Message(role="user", content="hello")])
+
+    # The partial first attempt is discarded, not prepended
+    assert message.content == "Complete"
+    assert service.metrics.retries == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_without_finish_reason_is_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(200, text=f"data: {make_line({'content': 'Cut'})}\n\n")
+        return httpx.Response(200, text=sse_body("Whole"))
+
+    service = make_service(handler)
+    message = await service.get_message([Message(role="user", content="hello")])
+    assert message.content == "Whole"
+
+
+@pytest.mark.asyncio
+async def test_falls_back_after_retries_exhausted():
+    models = []
+
+    def handler(request):
+        model = json.loads(request.content)["model"]
+        models.append(model)
+        if model == "primary":
+            return httpx.Response(503, text="overloaded")
+        return httpx.Response(200, text=sse_body("From fallback"))
+
+    service = make_service(handler, model="primary", fallback_model="secondary", max_retries=2)
+    message = await service.get_message([Message(role="user", content="hello")])
+
+    assert message.content == "From fallback"
+    assert models == ["primary"] * 3 + ["secondary"]
+    assert service.metrics.fallbacks == 1
+    assert service.metrics.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": "bad request"})
+
+    service = make_service(handler, fallback_model="secondary")
+    message = await service.get_message([Message(role="user", content="hello")])
+
+    assert len(calls) == 1
+    assert message.content.startswith("I'm sorry")
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries():
+    def handler(request):
+        return httpx.Response(500, text="boom")
+
+    service = make_service(handler, max_retries=1)
+    message = await service.get_message([Message(role="user", content="hello")])
+
+    assert "failed after 2 attempts" in message.content
+    assert service.metrics.failures == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(httpx.Headers({"retry-after": "7"})) == 7.0
+    assert parse_retry_after(httpx.Headers({"retry-after-ms": "250"})) == 0.25
+    assert parse_retry_after(httpx.Headers({})) is None
+    date = parse_retry_after(httpx.Headers({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}))
+    assert date < 0
+
+
+def test_accumulator_reports_completed_tool_calls():
+    completed = []
+    accumulator = StreamAccumulator(on_tool_call=completed.append)
+    accumulator.add_tool_call_fragment(0, "call_a", "function", "SnapTool", '{"line_numbers": ')
+    accumulator.add_tool_call_fragment(0, arguments='{"nested": true}')
+    # An inner closing brace doesn't complete the call
+    assert completed == []
+    accumulator.add_tool_call_fragment(0, arguments="}")
+    assert [tc.id for tc in completed] == ["call_a"]
+
+    accumulator.add_tool_call_fragment(1, "call_b", "function", "ShellTool", '{"commands": [')
+    accumulator.add_tool_call_fragment(2, "call_c", "function", "HttpTool", "{}")
+    # call_b's arguments never closed, but call_c starting finishes it
+    assert [tc.id for tc in completed] == ["call_a", "call_b", "call_c"]
+    assert completed[1].function.arguments == '{"commands": ['
+
+
+def test_accumulator_tracks_braces_inside_strings(monkeypatch):
+    completed = []
+    parses = []
+    original_loads = json.loads
+    monkeypatch.setattr(json, "loads", lambda text, *a, **k: parses.append(text) or original_loads(text, *a, **k))
+    accumulator = StreamAccumulator(on_tool_call=completed.append)
+
+    # The second fragment ends on a backslash escaping the quote that starts the third
+    fragments = ['{"content": "def f() {', ' return \\"}\\', '"; }', "\\\\", '"}']
+    for fragment in fragments:
+        assert completed == []
+        accumulator.add_tool_call_fragment(0, "call_a", "function", "FileTool", fragment)
+
+    assert [tc.id for tc in completed] == ["call_a"]
+    assert original_loads(completed[0].function.arguments) == {"content": 'def f() { return "}"; }\\'}
+    # Parsed once, when the outer object closed, not at every fragment ending in }
+    assert len(parses) == 1
@@ -3,6 +3,7 @@ from toolkit import ToolKit
 
 import pytest
 import json
+import time
 
 
 @pytest.mark.asyncio
@@ -18,3 +19,85 @@ async def test_shell_tool_echo_command():
     result_list = json.loads(result)
     assert len(result_list) == 1
     assert "Hello World" in result_list[0]
+
+
+@pytest.mark.asyncio
+async def test_shell_tool_concurrent_commands():
+    toolkit = ToolKit()
+    tool = ShellTool(toolkit)
+
+    commands = [
+        ShellCommand(command="sleep 0.3 && echo", arguments=[str(i)]) for i in range(3)
+    ]
+    start = time.perf_counter()
+    result = await tool.execute(ShellToolInput(commands=commands, concurrent=True))
+    elapsed = time.perf_counter() - start
+
+    assert [line.strip() for line in json.loads(result)] == ["0", "1", "2"]
+    assert elapsed < 0.8
+
+
+@pytest.mark.asyncio
+async def test_shell_tool_timeout():
+    toolkit = ToolKit()
+    tool = ShellTool(toolkit)
+
+    command = ShellCommand(command="echo started && sleep 5", timeout=0.3)
+    start = time.perf_counter()
+    result = await tool.execute(ShellToolInput(commands=[command]))
+
+    assert time.perf_counter() - start < 2
+    result_list = json.loads(result)
+    assert "timed out" in result_list[0]
+    assert "started" in result_list[0]
+
+
+@pytest.mark.asyncio
+async def test_shell_tool_truncates_output():
+    toolkit = ToolKit()
+    tool = ShellTool(toolkit)
+
+    command = ShellCommand(command="head -c 5000 /dev/zero | tr '\\0' 'a'")
+    result = await tool.execute(
+        ShellToolInput(commands=[command], max_output_bytes=100, stream_output=False)
+    )
+
+    output = json.loads(result)[0]
+    assert output.startswith("a" * 100)
+    assert "[... truncated 4900 bytes ...]" in output
+
+
+@pytest.mark.asyncio
+async def test_shell_tool_nonzero_returncode():
+    toolkit = ToolKit()
+    tool = ShellTool(toolkit)
+
+    result = await tool.execute(ShellToolInput(commands=[ShellCommand(command="ls /nonexistent_dir")]))
+    assert "Got error in shell command!" in json.loads(result)[0]
+
+
+@pytest.mark.asyncio
+async def test_shell_tool_nonzero_returncode_marks_truncation():
+    tool = ShellTool(ToolKit())
+
+    command = ShellCommand(command="head -c 5000 /dev/zero | tr '\\0' 'a'; exit 3")
+    result = await tool.execute(
+        ShellToolInput(commands=[command], max_output_bytes=100, stream_output=False)
+    )
+
+    assert "returncode=3" in json.loads(result)[0]
+    assert "[... truncated 4900 bytes ...]" in json.loads(result)[0]
+
+
+@pytest.mark.asyncio
+async def test_shell_tool_echo_buffer_is_bounded(monkeypatch):
+    tool = ShellTool(ToolKit())
+    tool.max_echo_line_bytes = 1000
+    echoed = []
+    monkeypatch.setattr(tool, "echo", lambda prefix, line: echoed.append(len(line)))
+
+    command = ShellCommand(command="head -c 1000000 /dev/zero | tr '\\0' 'a'")
+    await tool.execute(ShellToolInput(commands=[command], max_output_bytes=1000))
+
+    assert sum(echoed) == 1_000_000
+    assert max(echoed) <= 1000 + 65536
@@ -1,7 +1,11 @@
 from tools.snap_tool import SnapTool, SnapToolInput
+from tools.file_walker import walk
+from models import FunctionCall, ToolCall
 from toolkit import ToolKit
 
 import pytest
+import json
+import os
 
 
 @pytest.mark.asyncio
@@ -21,3 +25,136 @@ async def test_generate_full_snapshot():
     await tool.execute(SnapToolInput(line_numbers=True, infra_files=True))
     assert "Dockerfile" in open("state.txt").read()
     assert ".github/workflows/pytest.yml" in open("state.txt").read()
+
+
+def make_tree(root):
+    (root / "tools").mkdir()
+    (root / "tests").mkdir()
+    (root / "main.py").write_text("print('main')\n")
+    (root / "tools" / "a_tool.py").write_text("A = 1\nB = 2\n")
+    (root / "tests" / "test_a.py").write_text("")
+
+
+@pytest.mark.asyncio
+async def test_unchanged_tree_reuses_snapshot(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    tool = SnapTool(ToolKit())
+
+    first = await tool.execute(SnapToolInput(line_numbers=True))
+    assert "--- tools/a_tool.py ---\n```\n     1  A = 1\n     2  B = 2\n" in first
+    state_mtime = os.stat("state.txt").st_mtime_ns
+
+    # With every stat matching the index, no source file is hashed or read again
+    monkeypatch.setattr("tools.snap_tool.mapped", None)
+    second = await tool.execute(SnapToolInput(line_numbers=True))
+    assert second == first
+    assert os.stat("state.txt").st_mtime_ns == state_mtime
+
+
+@pytest.mark.asyncio
+async def test_changed_file_rewrites_snapshot(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    tool = SnapTool(ToolKit())
+
+    await tool.execute(SnapToolInput())
+    (tmp_path / "main.py").write_text("print('changed')\n")
+    output = await tool.execute(SnapToolInput())
+
+    assert "print('changed')" in output
+    assert open("state.txt").read() == output
+
+
+@pytest.mark.asyncio
+async def test_diff_returns_only_changes(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    tool = SnapTool(ToolKit())
+
+    await tool.execute(SnapToolInput())
+    assert await tool.execute(SnapToolInput(diff=True)) == "No changes since the last snapshot."
+
+    (tmp_path / "tools" / "a_tool.py").write_text("A = 3\n")
+    (tmp_path / "tools" / "b_tool.py").write_text("B = 1\n")
+    (tmp_path / "tests" / "test_a.py").unlink()
+    diff = await tool.execute(SnapToolInput(diff=True))
+
+    assert "--- tools/a_tool.py ---" in diff
+    assert "--- tools/b_tool.py ---" in diff
+    assert "--- tests/test_a.py (deleted) ---" in diff
+    assert "main.py" not in diff
+    # The diff becomes the new baseline
+    assert await tool.execute(SnapToolInput(diff=True)) == "No changes since the last snapshot."
+
+
+def test_walker_respects_gitignore(tmp_path):
+    (tmp_path / ".gitignore").write_text("build/\n*.gen.py\n/top_only.py\n")
+    (tmp_path / "pkg" / "build").mkdir(parents=True)
+    (tmp_path / "pkg" / ".gitignore").write_text("secret*.py\n!secret_ok.py\n")
+    for path in [
+        "main.py", "top_only.py", "notes.txt", "x.gen.py",
+        "pkg/mod.py", "pkg/top_only.py", "pkg/build/out.py",
+        "pkg/secret.py", "pkg/secret_ok.py",
+    ]:
+        (tmp_path / path).write_text("")
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "hook.py").write_text("")
+
+    assert walk(str(tmp_path), ["*.py"]) == [
+        "main.py", "pkg/mod.py", "pkg/secret_ok.py", "pkg/top_only.py",
+    ]
+    assert walk(str(tmp_path), ["*.py"], exclude=["pkg"]) == ["main.py"]
+    assert "pkg/build/out.py" in walk(str(tmp_path), ["*.py"], respect_gitignore=False)
+
+
+@pytest.mark.asyncio
+async def test_budget_keeps_highest_priority_files(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    (tmp_path / "tools" / "big.py").write_text("x" * 5000)
+    (tmp_path / "tests" / "test_big.py").write_text("y" * 900)
+    monkeypatch.chdir(tmp_path)
+    tool = SnapTool(ToolKit())
+
+    output = await tool.execute(SnapToolInput(max_bytes=1000))
+    assert output.index("--- main.py ---") < output.index("--- tools/a_tool.py ---")
+    assert output.index("--- tools/a_tool.py ---") < output.index("--- tests/test_a.py ---")
+    assert "--- tools/big.py ---" not in output
+    assert "omitted to stay within the budget (2 files): tools/big.py, tests/test_big.py" in output
+    assert len(output.encode()) < 1200
+
+    output = await tool.execute(SnapToolInput(max_bytes=None, priority=["tests/*"]))
+    assert output.startswith("--- tests/test_a.py ---")
+    assert "tools/big.py" in output
+
+    output = await tool.execute(SnapToolInput(max_bytes=None, max_tokens=30))
+    assert "--- main.py ---" in output
+    assert "--- tools/big.py ---" not in output
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_take_turns(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    toolkit = ToolKit(auto_approve=True)
+    tool_calls = [
+        ToolCall(
+            index=i,
+            id=f"call_{i}",
+            type="function",
+            function=FunctionCall(name="SnapTool", arguments=json.dumps({"line_numbers": i % 2 == 0})),
+        )
+        for i in range(4)
+    ]
+
+    results = await toolkit.execute_tool_calls(tool_calls)
+    await toolkit.aclose()
+
+    assert all(result.startswith("--- main.py ---") for result in results)
+    assert not [name for name in os.listdir(tmp_path / ".cache" / "snap") if name.endswith(".tmp")]
+
+
+def test_diff_is_never_speculated():
+    tool = SnapTool(ToolKit())
+    assert tool.is_read_only(SnapToolInput())
+    assert not tool.is_read_only(SnapToolInput(diff=True))
@@ -0,0 +1,47 @@
+from benchmarks.bench_startup import HEAVY_MODULES, SCENARIOS, measure
+from tool_registry import ToolRegistry, build_manifest, load_manifest
+from toolkit import ToolKit
+
+import pytest
+import copy
+
+
+def test_manifest_is_up_to_date():
+    # Regenerate with `python tool_registry.py` after changing a tool
+    assert load_manifest() == build_manifest()
+
+
+def test_startup_does_not_import_tool_dependencies():
+    _, imports = measure(SCENARIOS["lazy"])
+
+    assert "toolkit" in imports
+    assert not [name for name in HEAVY_MODULES if name in imports]
+    assert not [name for name in imports if name.startswith("tools.") and name != "tools.base_tool"]
+
+
+@pytest.mark.asyncio
+async def test_tools_load_on_first_use():
+    toolkit = ToolKit()
+    assert toolkit.tools.loaded() == []
+    assert "ShellTool" in toolkit.tools
+    assert "ShellTool" in [tool["function"]["name"] for tool in toolkit.get_tools_json()]
+
+    tool = toolkit.tools["ShellTool"]
+    assert type(tool).__name__ == "ShellTool"
+    assert toolkit.tools["ShellTool"] is tool
+    assert toolkit.tools.loaded() == [tool]
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stale_manifest_entries_are_imported_eagerly():
+    manifest = copy.deepcopy(load_manifest())
+    manifest["modules"]["tools.shell_tool"]["sha256"] = "stale"
+    manifest["tools"]["ShellTool"]["description"] = "outdated description"
+
+    toolkit = ToolKit()
+    toolkit.tools = ToolRegistry(toolkit, manifest)
+
+    assert [type(tool).__name__ for tool in toolkit.tools.loaded()] == ["ShellTool"]
+    assert toolkit.tools.description("ShellTool") != "outdated description"
+    await toolkit.aclose()
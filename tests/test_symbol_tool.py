@@ -0,0 +1,93 @@
+from tools.symbol_tool import SymbolAction, SymbolIndex, SymbolTool, SymbolToolInput, extract_symbols
+from toolkit import ToolKit
+
+import pytest
+import os
+
+SOURCE = '''import functools
+
+
+class Greeter(Base):
+    """Says hello."""
+
+    @functools.cache
+    def greet(self, name: str) -> str:
+        return f"hello {name}"
+
+    async def wait(self):
+        pass
+
+
+def helper(x, *args, key=None):
+    def inner():
+        pass
+    return inner
+'''
+
+
+def test_extract_symbols():
+    symbols = {symbol["name"]: symbol for symbol in extract_symbols(SOURCE)}
+
+    assert list(symbols) == ["Greeter", "Greeter.greet", "Greeter.wait", "helper", "helper.inner"]
+    assert symbols["Greeter"]["signature"] == "(Base)"
+    assert symbols["Greeter"]["doc"] == "Says hello."
+    assert (symbols["Greeter"]["start"], symbols["Greeter"]["end"]) == (4, 12)
+    # The decorator line belongs to the method
+    assert (symbols["Greeter.greet"]["start"], symbols["Greeter.greet"]["end"]) == (7, 9)
+    assert symbols["Greeter.greet"]["signature"] == "(self, name: str) -> str"
+    assert symbols["Greeter.wait"]["kind"] == "async method"
+    assert symbols["helper"]["signature"] == "(x, *args, key=None)"
+
+
+def test_index_updates_incrementally(tmp_path, monkeypatch):
+    (tmp_path / "a.py").write_text(SOURCE)
+    (tmp_path / "b.py").write_text("def b():\n    pass\n")
+    index = SymbolIndex(str(tmp_path))
+    index.update()
+
+    parsed = []
+    original = extract_symbols
+
+    def counting_extract(source):
+        parsed.append(source)
+        return original(source)
+
+    monkeypatch.setattr("tools.symbol_tool.extract_symbols", counting_extract)
+
+    # A fresh index loads the persisted one and parses nothing
+    reloaded = SymbolIndex(str(tmp_path))
+    assert reloaded.update().keys() == {"a.py", "b.py"}
+    assert parsed == []
+
+    (tmp_path / "b.py").write_text("def b2():\n    pass\n")
+    (tmp_path / "a.py").unlink()
+    (tmp_path / "broken.py").write_text("def (:\n")
+    files = reloaded.update()
+    assert len(parsed) == 2
+    assert [symbol["name"] for symbol in files["b.py"]["symbols"]] == ["b2"]
+    assert "a.py" not in files
+    assert files["broken.py"]["error"]
+
+
+@pytest.mark.asyncio
+async def test_symbol_tool_actions(tmp_path, monkeypatch):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "greeter.py").write_text(SOURCE)
+    (tmp_path / "main.py").write_text("def main():\n    return 1\n")
+    monkeypatch.chdir(tmp_path)
+    tool = SymbolTool(ToolKit())
+
+    outline = await tool.execute(SymbolToolInput(action=SymbolAction.OUTLINE))
+    assert "main.py\n  function main()  [1-2]" in outline
+    assert "    method Greeter.greet(self, name: str) -> str  [7-9]" in outline
+
+    search = await tool.execute(SymbolToolInput(action=SymbolAction.SEARCH, query="GREET"))
+    assert search.splitlines()[0] == "class Greeter(Base)  [pkg/greeter.py:4-12]  # Says hello."
+
+    source = await tool.execute(
+        SymbolToolInput(action=SymbolAction.GET, names=["pkg/greeter.py:Greeter.greet", "missing"], line_numbers=True)
+    )
+    assert "--- pkg/greeter.py:7-9 Greeter.greet ---\n     7      @functools.cache" in source
+    assert 'return f"hello {name}"' in source
+    assert "--- missing not found ---" in source
+    assert os.path.exists(tmp_path / ".cache" / "symbols" / "index.json")
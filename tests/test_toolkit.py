@@ -0,0 +1,247 @@
+from benchmarks.mock_openai_server import MockOpenAIServer, make_chunk
+from openai_service import InterruptFlag, OpenAIService
+from tools.base_tool import BaseTool
+from models import Message, ToolCall, FunctionCall
+from toolkit import SpeculativeDispatcher, ToolKit
+
+from pydantic import BaseModel
+import threading
+import httpx
+import asyncio
+import pytest
+import time
+import json
+
+
+class SleepInput(BaseModel):
+    seconds: float
+
+
+class BlockingSleepTool(BaseTool):
+    input_model = SleepInput
+    blocking = True
+
+    async def execute(self, input_data: SleepInput) -> str:
+        time.sleep(input_data.seconds)
+        return threading.current_thread().name
+
+
+class CountingTool(BaseTool):
+    input_model = SleepInput
+    max_concurrency = 1
+
+    def __init__(self, toolkit):
+        super().__init__(toolkit)
+        self.running = 0
+        self.max_running = 0
+
+    async def execute(self, input_data: SleepInput) -> str:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(input_data.seconds)
+        self.running -= 1
+        return "done"
+
+
+def make_tool_call(name, index, **arguments):
+    return ToolCall(
+        index=index,
+        id=f"call_{index}",
+        type="function",
+        function=FunctionCall(name=name, arguments=json.dumps(arguments)),
+    )
+
+
+@pytest.mark.asyncio
+async def test_blocking_tools_run_off_loop_in_parallel():
+    toolkit = ToolKit(max_concurrency=4, auto_approve=True)
+    toolkit.tools["BlockingSleepTool"] = BlockingSleepTool(toolkit)
+    tool_calls = [make_tool_call("BlockingSleepTool", i, seconds=0.2) for i in range(4)]
+
+    start = time.perf_counter()
+    results = await toolkit.execute_tool_calls(tool_calls)
+    elapsed = time.perf_counter() - start
+
+    assert all(result.startswith("tool") for result in results)
+    assert elapsed < 0.6
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_per_tool_concurrency_limit():
+    toolkit = ToolKit(max_concurrency=4, auto_approve=True)
+    counting_tool = CountingTool(toolkit)
+    toolkit.tools["CountingTool"] = counting_tool
+    tool_calls = [make_tool_call("CountingTool", i, seconds=0.01) for i in range(3)]
+
+    results = await toolkit.execute_tool_calls(tool_calls)
+
+    assert results == ["done"] * 3
+    assert counting_tool.max_running == 1
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_approval_prompted_once_per_turn(monkeypatch):
+    prompts = []
+
+    def fake_input(prompt):
+        prompts.append(prompt)
+        return "1 3"
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    toolkit = ToolKit()
+    tool_calls = [
+        make_tool_call("ShellTool", i, commands=[{"command": "echo", "arguments": [str(i)]}])
+        for i in range(3)
+    ]
+
+    results = await toolkit.execute_tool_calls(tool_calls)
+
+    assert len(prompts) == 1
+    assert json.loads(results[0])[0].strip() == "0"
+    assert results[1].startswith("User rejected tool call")
+    assert json.loads(results[2])[0].strip() == "2"
+    await toolkit.aclose()
+
+
+class ReadOnlyTool(BaseTool):
+    input_model = SleepInput
+    read_only = True
+
+    def __init__(self, toolkit):
+        super().__init__(toolkit)
+        self.started = []
+
+    async def execute(self, input_data: SleepInput) -> str:
+        self.started.append(time.perf_counter())
+        await asyncio.sleep(input_data.seconds)
+        return f"slept {input_data.seconds}"
+
+
+@pytest.mark.asyncio
+async def test_speculative_dispatch_reuses_started_call():
+    toolkit = ToolKit(auto_approve=True)
+    tool = ReadOnlyTool(toolkit)
+    toolkit.tools["ReadOnlyTool"] = tool
+    toolkit.tools["CountingTool"] = CountingTool(toolkit)
+    speculative = SpeculativeDispatcher(toolkit)
+    tool_calls = [
+        make_tool_call("ReadOnlyTool", 0, seconds=0.01),
+        make_tool_call("CountingTool", 1, seconds=0.01),
+    ]
+
+    for tool_call in tool_calls:
+        speculative(tool_call)
+    # Only the read-only tool is started early
+    assert len(speculative.tasks) == 1
+    await asyncio.sleep(0)
+    assert len(tool.started) == 1
+
+    results = await toolkit.execute_tool_calls(tool_calls, speculative=speculative)
+
+    assert results == ["slept 0.01", "done"]
+    assert len(tool.started) == 1
+    assert speculative.tasks == {}
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_no_speculation_without_auto_approval():
+    toolkit = ToolKit()
+    toolkit.tools["ReadOnlyTool"] = ReadOnlyTool(toolkit)
+    speculative = SpeculativeDispatcher(toolkit)
+    speculative(make_tool_call("ReadOnlyTool", 0, seconds=0.01))
+    assert speculative.tasks == {}
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_unclaimed_speculative_calls_are_cancelled():
+    toolkit = ToolKit(auto_approve=True)
+    toolkit.tools["ReadOnlyTool"] = ReadOnlyTool(toolkit)
+    speculative = SpeculativeDispatcher(toolkit)
+    speculative(make_tool_call("ReadOnlyTool", 0, seconds=10))
+    task = next(iter(speculative.tasks.values()))
+
+    # The final message asked for different arguments
+    results = await toolkit.execute_tool_calls(
+        [make_tool_call("ReadOnlyTool", 0, seconds=0.01)], speculative=speculative
+    )
+
+    assert results == ["slept 0.01"]
+    await asyncio.sleep(0)
+    assert task.cancelled()
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_start_while_message_streams():
+    arguments = ['{"seco', 'nds": 0', '.0}']
+    lines = [make_chunk({"role": "assistant", "tool_calls": [
+        {"index": 0, "id": "call_0", "type": "function", "function": {"name": "ReadOnlyTool", "arguments": ""}}
+    ]})]
+    lines += [make_chunk({"tool_calls": [{"index": 0, "function": {"arguments": a}}]}) for a in arguments]
+    # Plenty of further deltas for a second call, throttled below
+    lines.append(make_chunk({"tool_calls": [
+        {"index": 1, "id": "call_1", "type": "function", "function": {"name": "ReadOnlyTool", "arguments": ""}}
+    ]}))
+    lines += [make_chunk({"tool_calls": [{"index": 1, "function": {"arguments": a}}]}) for a in ['{"sec', "onds", '": ', "0.001", "}"]]
+    lines.append(make_chunk({}, finish_reason="tool_calls"))
+
+    toolkit = ToolKit(auto_approve=True)
+    tool = ReadOnlyTool(toolkit)
+    toolkit.tools["ReadOnlyTool"] = tool
+    async with MockOpenAIServer(recordings={"calls": lines}, default="calls", token_rate=50) as server:
+        service = OpenAIService([], InterruptFlag(), client=httpx.AsyncClient(), base_url=server.base_url)
+        speculative = SpeculativeDispatcher(toolkit)
+        message = await service.get_message(
+            [Message(role="user", content="go")], tools=True, on_tool_call=speculative
+        )
+        finished = time.perf_counter()
+        await service.client.aclose()
+
+    # The first call started well before the stream ended, the second as its JSON closed
+    assert len(tool.started) == 2
+    assert finished - tool.started[0] > 0.1
+    results = await toolkit.execute_tool_calls(message.tool_calls, speculative=speculative)
+    assert results == ["slept 0.0", "slept 0.001"]
+    assert len(tool.started) == 2
+    await toolkit.aclose()
+
+
+@pytest.mark.asyncio
+async def test_tools_json_is_cached_and_stable():
+    toolkit = ToolKit()
+    tools_json = toolkit.get_tools_json()
+
+    assert toolkit.get_tools_json() is tools_json
+    names = [tool["function"]["name"] for tool in tools_json]
+    assert names == sorted(names)
+    assert json.dumps(tools_json) == json.dumps(tools_json, sort_keys=True)
+
+    # Another toolkit, with tools discovered afresh, produces the same bytes
+    other = ToolKit()
+    assert json.dumps(other.get_tools_json()) == json.dumps(tools_json)
+
+    toolkit.tools["ReadOnlyTool"] = ReadOnlyTool(toolkit)
+    assert "ReadOnlyTool" in [tool["function"]["name"] for tool in toolkit.get_tools_json()]
+    await toolkit.aclose()
+    await other.aclose()
+
+
+@pytest.mark.asyncio
+async def test_unknown_and_unloadable_tools_are_reported():
+    toolkit = ToolKit(auto_approve=True)
+    # A manifest entry whose module no longer imports
+    toolkit.tools.instances["BrokenTool"] = None
+    toolkit.tools.entries["BrokenTool"] = {"module": "tools.no_such_module"}
+
+    missing, broken = await toolkit.execute_tool_calls(
+        [make_tool_call("NoSuchTool", 0), make_tool_call("BrokenTool", 1)]
+    )
+
+    assert "'FileTool'" in missing and "KeysView" not in missing
+    assert broken.startswith("Error loading BrokenTool: No module named 'tools.no_such_module'")
+    assert not toolkit.can_speculate(make_tool_call("BrokenTool", 2))
+    await toolkit.aclose()
@@ -3,10 +3,14 @@ from tools.web_scraping_tool import (
     WebScrapingToolInput,
     WebScrapingTask,
 )
+from tools.html_parsing import available_backends, extract_data_points, resolve_backend
 from toolkit import ToolKit
 
+import asyncio
 import pytest
+import httpx
 import json
+import time
 
 
 @pytest.mark.asyncio
@@ -80,3 +84,116 @@ async def test_web_scraping_tool_multiple_tasks():
                     "<" not in value and ">" not in value
                 ), f"HTML tags detected in {key}: {value}"
                 assert len(value.strip()) > 0, f"No content found for {key}"
+
+
+def mock_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_web_scraping_tool_concurrent_fetch_keeps_order():
+    active = {"a.test": 0, "b.test": 0}
+    peak = {"a.test": 0, "b.test": 0}
+
+    async def handler(request):
+        host = request.url.host
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        await asyncio.sleep(0.05)
+        active[host] -= 1
+        return httpx.Response(200, html=f"<h1>{request.url.path}</h1>")
+
+    tk = ToolKit()
+    tk.http_clients.clients["default"] = mock_client(handler)
+    scraping_tool = WebScrapingTool(tk)
+    urls = [f"https://{host}/page{i}" for i in range(6) for host in ("a.test", "b.test")]
+    tool_input = WebScrapingToolInput(
+        tasks=[WebScrapingTask(url=url, data_points={"Title": "h1"}) for url in urls],
+        per_host_limit=2,
+    )
+
+    start = time.perf_counter()
+    result = json.loads(await scraping_tool.execute(tool_input))
+    elapsed = time.perf_counter() - start
+
+    assert [task_result["url"] for task_result in result] == urls
+    assert result[3]["data_points"]["Title"] == ["/page1"]
+    assert peak == {"a.test": 2, "b.test": 2}
+    assert elapsed < 12 * 0.05
+    await tk.aclose()
+
+
+@pytest.mark.asyncio
+async def test_web_scraping_tool_busy_host_does_not_block_others():
+    first_seen = {}
+    start = time.perf_counter()
+
+    async def handler(request):
+        first_seen.setdefault(request.url.host, time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, html="<h1>page</h1>")
+
+    tk = ToolKit()
+    tk.http_clients.clients["default"] = mock_client(handler)
+    scraping_tool = WebScrapingTool(tk)
+    # Most of the batch on one host, queued ahead of the other
+    urls = [f"https://a.test/page{i}" for i in range(8)] + ["https://b.test/page0"]
+    tool_input = WebScrapingToolInput(
+        tasks=[WebScrapingTask(url=url, data_points={"Title": "h1"}) for url in urls],
+        max_concurrency=4,
+        per_host_limit=1,
+    )
+
+    await scraping_tool.execute(tool_input)
+
+    # b.test starts alongside the first a.test request, not after the a.test queue drains
+    assert first_seen["b.test"] < 0.05
+    await tk.aclose()
+
+
+@pytest.mark.asyncio
+async def test_web_scraping_tool_retries_server_errors():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url)
+        if len(attempts) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, html="<p class='x'>ok</p>")
+
+    tk = ToolKit()
+    tk.http_clients.clients["default"] = mock_client(handler)
+    scraping_tool = WebScrapingTool(tk)
+    scraping_tool.retry_backoff = 0.01
+    tool_input = WebScrapingToolInput(
+        tasks=[WebScrapingTask(url="https://a.test/", data_points={"X": "p.x"})],
+        retries=2,
+    )
+
+    result = json.loads(await scraping_tool.execute(tool_input))
+    assert len(attempts) == 3
+    assert result[0]["data_points"]["X"] == ["ok"]
+    await tk.aclose()
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_extract_data_points_backends_agree(backend):
+    content = (
+        b"<html><body><ul>"
+        b"<li class='item'><a href='/1'> First <b>item</b> </a></li>"
+        b"<li class='item'><a href='/2'>Second</a></li>"
+        b"</ul><p id='summary'>Two items</p></body></html>"
+    )
+    data_points = {"Items": "li.item a", "Summary": "#summary", "Missing": "table td"}
+
+    assert extract_data_points(content, data_points, backend) == {
+        "Items": ["Firstitem", "Second"],
+        "Summary": ["Two items"],
+        "Missing": [],
+    }
+
+
+def test_resolve_backend_falls_back_to_html_parser(monkeypatch):
+    monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+    assert resolve_backend("lxml") == "html.parser"
+    assert available_backends() == ["html.parser"]
@@ -0,0 +1,147 @@
+from tools.base_tool import BaseTool
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional
+import importlib
+import hashlib
+import inspect
+import pkgutil
+import json
+import os
+
+TOOLS_PACKAGE = "tools"
+MANIFEST_PATH = os.path.join(os.path.dirname(__file__), "tools", "manifest.json")
+
+
+def tool_modules() -> Dict[str, str]:
+    """Return `{module name: source path}` for the tool modules, without importing them."""
+    package = importlib.import_module(TOOLS_PACKAGE)
+    modules = {}
+    for module_info in pkgutil.iter_modules(package.__path__, TOOLS_PACKAGE + "."):
+        if not module_info.ispkg:
+            short_name = module_info.name.rsplit(".", 1)[1]
+            modules[module_info.name] = os.path.join(module_info.module_finder.path, short_name + ".py")
+    return modules
+
+
+def module_hash(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as fp:
+            return hashlib.sha256(fp.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def tool_classes(module) -> Dict[str, type]:
+    return {
+        member_name: obj
+        for member_name, obj in inspect.getmembers(module)
+        if inspect.isclass(obj) and issubclass(obj, BaseTool) and member_name != "BaseTool"
+    }
+
+
+def tool_entry(module_name: str, tool_class: type) -> Dict:
+    return {
+        "module": module_name,
+        "description": tool_class.description,
+        "parameters": tool_class.input_model.model_json_schema(),
+    }
+
+
+def build_manifest() -> Dict:
+    # Imports every tool module; only run when tools change
+    manifest = {"modules": {}, "tools": {}}
+    for module_name, path in sorted(tool_modules().items()):
+        classes = tool_classes(importlib.import_module(module_name))
+        manifest["modules"][module_name] = {"sha256": module_hash(path), "tools": sorted(classes)}
+        for tool_name, tool_class in sorted(classes.items()):
+            manifest["tools"][tool_name] = tool_entry(module_name, tool_class)
+    return manifest
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Optional[Dict]:
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_manifest(path: str = MANIFEST_PATH) -> Dict:
+    manifest = build_manifest()
+    with open(path + ".tmp", "w") as fp:
+        json.dump(manifest, fp, indent=2, sort_keys=True)
+        fp.write("\n")
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+class ToolRegistry(MutableMapping):
+    """Tool name -> tool instance, importing each tool's module on first access.
+
+    Names, descriptions and schemas come from `tools/manifest.json`, so listing
+    tools costs no imports. A module whose source no longer matches the hash in
+    the manifest (or that is missing from it) is imported eagerly instead, so a
+    stale manifest costs startup time but never serves a wrong schema.
+    Regenerate it with `python tool_registry.py`.
+    """
+
+    def __init__(self, toolkit, manifest: Optional[Dict] = None) -> None:
+        self.toolkit = toolkit
+        self.instances: Dict[str, Optional[BaseTool]] = {}
+        self.entries: Dict[str, Dict] = {}
+        # Bumped when tools are added or replaced, not when they are lazily loaded
+        self.version = 0
+
+        manifest = manifest or {"modules": {}, "tools": {}}
+        for module_name, path in tool_modules().items():
+            module_entry = manifest["modules"].get(module_name)
+            if module_entry and module_entry["sha256"] == module_hash(path):
+                for tool_name in module_entry["tools"]:
+                    self.instances[tool_name] = None
+                    self.entries[tool_name] = manifest["tools"][tool_name]
+            else:
+                module = importlib.import_module(module_name)
+                for tool_name, tool_class in tool_classes(module).items():
+                    self.instances[tool_name] = tool_class(toolkit)
+                    self.entries[tool_name] = tool_entry(module_name, tool_class)
+
+    def __getitem__(self, name: str) -> BaseTool:
+        tool = self.instances[name]
+        if tool is None:
+            module = importlib.import_module(self.entries[name]["module"])
+            tool = getattr(module, name)(self.toolkit)
+            self.instances[name] = tool
+        return tool
+
+    def __setitem__(self, name: str, tool: BaseTool):
+        self.instances[name] = tool
+        self.entries[name] = tool_entry(type(tool).__module__, type(tool))
+        self.version += 1
+
+    def __delitem__(self, name: str):
+        del self.instances[name]
+        del self.entries[name]
+        self.version += 1
+
+    def __contains__(self, name) -> bool:
+        return name in self.instances
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.instances)
+
+    def __len__(self) -> int:
+        return len(self.instances)
+
+    def description(self, name: str) -> str:
+        return self.entries[name]["description"]
+
+    def parameters(self, name: str) -> Dict:
+        return self.entries[name]["parameters"]
+
+    def loaded(self) -> List[BaseTool]:
+        return [tool for tool in self.instances.values() if tool is not None]
+
+
+if __name__ == "__main__":
+    manifest = write_manifest()
+    print(f"Wrote {len(manifest['tools'])} tools to {MANIFEST_PATH}")
@@ -1,71 +1,199 @@
+from tool_registry import ToolRegistry, load_manifest
 from tools.base_tool import BaseTool
-from pydantic import ValidationError
-from typing import List, Dict
+from http_clients import HttpClientRegistry
+from http_cache import ResponseCache
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pydantic import BaseModel, ValidationError
+from typing import List, Dict, Optional, Tuple
 from models import ToolCall
 from rich import print
-import importlib
-import pkgutil
-import inspect
+import traceback
+import asyncio
 import json
 
 
 class ToolKit:
-    def __init__(self) -> None:
-        self.tools: Dict[str, BaseTool] = self.load_tools()
-
-    # Separate discovery into atomic and complex tools
-    def load_tools(self):
-        tools_package = importlib.import_module("tools")
-        tools = {}
-        for _, name, ispkg in pkgutil.iter_modules(
-            tools_package.__path__, tools_package.__name__ + "."
-        ):
-            if not ispkg:
-                module = importlib.import_module(name)
-                for member_name, obj in inspect.getmembers(module):
-                    if (
-                        inspect.isclass(obj)
-                        and issubclass(obj, BaseTool)
-                        and member_name != "BaseTool"
-                    ):
-                        tools[member_name] = obj(self)
-
-        return tools
+    def __init__(self, max_concurrency: int = 4, auto_approve: bool = False) -> None:
+        self.max_concurrency = max_concurrency
+        self.auto_approve = auto_approve
+        # Bounds the tool calls of one assistant turn that run at the same time
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.tool_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="tool"
+        )
+        self.http_clients = HttpClientRegistry()
+        self.http_cache = ResponseCache()
+        self.tools_json_cache: Optional[Tuple] = None
+        self.tools = self.load_tools()
+
+    def load_tools(self) -> ToolRegistry:
+        # Tool modules are imported on first use; names and schemas come from the manifest
+        return ToolRegistry(self, load_manifest())
 
     def get_tools_json(self) -> List[Dict]:
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": tool_name,
-                    "description": tool.description,
-                    "parameters": tool.input_model.model_json_schema(),
-                },
-            }
-            for tool_name, tool in self.tools.items()
-        ]
+        # Generated once per set of tools, ordered by name with sorted keys so the
+        # prompt prefix stays byte-identical across turns (and provider-side cacheable)
+        key = (id(self.tools), self.tools.version)
+        if self.tools_json_cache is None or self.tools_json_cache[0] != key:
+            tools_json = [
+                {
+                    "type": "function",
+                    "function": {
+                        "name": tool_name,
+                        "description": self.tools.description(tool_name),
+                        "parameters": self.tools.parameters(tool_name),
+                    },
+                }
+                for tool_name in sorted(self.tools)
+            ]
+            self.tools_json_cache = (key, json.loads(json.dumps(tools_json, sort_keys=True)))
+        return self.tools_json_cache[1]
 
-    async def execute_tool(self, tool_call: ToolCall) -> str:
-        user_allowed = input(f"execute {tool_call}?\n(y/n) ")
-        if user_allowed.lower() == "y":
-            name = tool_call.function.name
-            if name not in self.tools:
-                return f"Error: {name} not in {self.tools.keys()=}"
+    async def execute_tool_calls(
+        self, tool_calls: List[ToolCall], speculative: Optional["SpeculativeDispatcher"] = None
+    ) -> List[str]:
+        approvals = await self.approve(tool_calls)
+
+        tasks = []
+        for tool_call, approved in zip(tool_calls, approvals):
+            if approved:
+                # Reuse the result of a call already started while the message streamed
+                task = speculative.claim(tool_call) if speculative else None
+                tasks.append(task or self.execute_bounded(tool_call))
             else:
-                print(f"{tool_call.function.arguments=}")
-                tool = self.tools[name]
-
-                try:
-                    tool_input = tool.input_model.model_validate(
-                        json.loads(tool_call.function.arguments)
-                    )
-                    return await tool.execute(tool_input)
-                except ValidationError as e:
-                    error_str = f"Error validating {tool_call.function.arguments=}: {e}"
-                    print(error_str)
-                    return error_str
-        else:
-            return f"User rejected tool call: {tool_call}"
+                tasks.append(self.reject(tool_call))
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            if speculative:
+                speculative.cancel()
+
+    async def execute_bounded(self, tool_call: ToolCall) -> str:
+        async with self.semaphore:
+            return await self.execute_tool(tool_call)
+
+    def can_speculate(self, tool_call: ToolCall) -> bool:
+        # Never run anything ahead of the user's approval
+        if not self.auto_approve:
+            return False
+        try:
+            tool = self.tools.get(tool_call.function.name)
+        except Exception:
+            # Left for execute_tool to report once the message is complete
+            return False
+        if tool is None:
+            return False
+        try:
+            tool_input = tool.input_model.model_validate(
+                json.loads(tool_call.function.arguments)
+            )
+        except (ValidationError, json.JSONDecodeError):
+            return False
+        return tool.is_read_only(tool_input)
+
+    async def approve(self, tool_calls: List[ToolCall]) -> List[bool]:
+        if self.auto_approve:
+            return [True] * len(tool_calls)
+
+        for i, tool_call in enumerate(tool_calls, start=1):
+            print(f"[{i}] {tool_call.function.name}({tool_call.function.arguments})")
+        # Keep the loop free while waiting on the user
+        answer = await asyncio.to_thread(
+            input, "execute these tool calls?\n(y/n, or the numbers to run, e.g. `1 3`) "
+        )
+        answer = answer.strip().lower()
+        if answer == "y":
+            return [True] * len(tool_calls)
+        selected = {word for word in answer.replace(",", " ").split() if word.isdigit()}
+        return [str(i) in selected for i in range(1, len(tool_calls) + 1)]
+
+    async def reject(self, tool_call: ToolCall) -> str:
+        return f"User rejected tool call: {tool_call}"
+
+    async def execute_tool(self, tool_call: ToolCall) -> str:
+        name = tool_call.function.name
+        if name not in self.tools:
+            return f"Error: {name} not in {sorted(self.tools)}"
+
+        print(f"{tool_call.function.arguments=}")
+        try:
+            # The first use of a tool imports its module
+            tool = self.tools[name]
+        except Exception as e:
+            return f"Error loading {name}: {e} {traceback.format_exc()}".strip()
+        try:
+            tool_input = tool.input_model.model_validate(
+                json.loads(tool_call.function.arguments)
+            )
+        except (ValidationError, json.JSONDecodeError) as e:
+            error_str = f"Error validating {tool_call.function.arguments=}: {e}"
+            print(error_str)
+            return error_str
+
+        try:
+            return await self.run_tool(tool, tool_input)
+        except Exception as e:
+            return f"Error executing {name}: {e} {traceback.format_exc()}".strip()
+
+    async def run_tool(self, tool: BaseTool, tool_input: BaseModel) -> str:
+        # Tools calling other tools (MetaTool, ChainTool) come through here too,
+        # so only the per-tool limit is applied, never the turn-wide semaphore
+        async with self.get_tool_semaphore(tool):
+            if tool.blocking:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self.executor, asyncio.run, tool.execute(tool_input)
+                )
+            return await tool.execute(tool_input)
+
+    def get_tool_semaphore(self, tool: BaseTool):
+        if tool.max_concurrency is None:
+            return nullcontext()
+        name = type(tool).__name__
+        if name not in self.tool_semaphores:
+            self.tool_semaphores[name] = asyncio.Semaphore(tool.max_concurrency)
+        return self.tool_semaphores[name]
+
+    async def aclose(self):
+        for tool in self.tools.loaded():
+            await tool.aclose()
+        await self.http_clients.aclose()
+        self.http_cache.flush()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SpeculativeDispatcher:
+    """Starts read-only tool calls while the assistant message is still streaming.
+
+    Pass it as the `on_tool_call` callback of `OpenAIService.get_message` and
+    then to `ToolKit.execute_tool_calls`, which picks up the running tasks.
+    Calls are matched by name and arguments, so a stream that is restarted
+    after a disconnect reuses identical calls; anything left unclaimed is
+    cancelled.
+    """
+
+    def __init__(self, toolkit: ToolKit) -> None:
+        self.toolkit = toolkit
+        self.tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def __call__(self, tool_call: ToolCall):
+        key = self.key(tool_call)
+        if key in self.tasks or not self.toolkit.can_speculate(tool_call):
+            return
+        self.tasks[key] = asyncio.create_task(self.toolkit.execute_bounded(tool_call))
+
+    def key(self, tool_call: ToolCall) -> Tuple[str, str]:
+        return tool_call.function.name, tool_call.function.arguments
+
+    def claim(self, tool_call: ToolCall) -> Optional[asyncio.Task]:
+        return self.tasks.pop(self.key(tool_call), None)
+
+    def cancel(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
 
 
 if __name__ == "__main__":
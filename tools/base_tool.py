@@ -1,10 +1,19 @@
 from abc import ABC, abstractmethod
 from pydantic import BaseModel
+from typing import Optional
 
 
 class BaseTool(ABC):
     input_model = BaseModel
     description = ""
+    # execute() does blocking work (subprocesses, file I/O), so the ToolKit
+    # runs it on a worker thread instead of the event loop
+    blocking = False
+    # Upper bound on concurrent executions of this tool, None for no limit
+    max_concurrency: Optional[int] = None
+    # execute() has no side effects worth confirming, so with auto approval the
+    # ToolKit may start it while the rest of the assistant message streams
+    read_only = False
 
     def __init__(self, toolkit):
         self.toolkit = toolkit
@@ -12,3 +21,11 @@ class BaseTool(ABC):
     @abstractmethod
     async def execute(self, args: BaseModel) -> str:
         ...
+
+    def is_read_only(self, args: BaseModel) -> bool:
+        # Override when only some inputs are side-effect free
+        return self.read_only
+
+    async def aclose(self):
+        # Release anything the tool keeps open across calls (pools, clients)
+        pass
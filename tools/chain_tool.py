@@ -59,7 +59,7 @@ class ChainTool(BaseTool):
             try:
                 tool = self.toolkit.tools[step.tool_name]
                 tool_input = tool.input_model.model_validate(step.tool_args)
-                result = await tool.execute(tool_input)
+                result = await self.toolkit.run_tool(tool, tool_input)
 
                 try:
                     result = json.loads(result)
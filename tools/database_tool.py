@@ -1,9 +1,12 @@
 from tools.base_tool import BaseTool
 from pydantic import BaseModel, Field
 from enum import Enum
+from collections import OrderedDict
 from typing import List, Optional
 import asyncpg
+import asyncio
 import json
+import time
 
 
 class DbType(str, Enum):
@@ -13,14 +16,48 @@ class DbType(str, Enum):
     INSERT = "insert"
     QUERY = "query"
     UPDATE = "update"
+    EXECUTEMANY = "executemany"
+    COPY = "copy"
+
+
+class ResultFormat(str, Enum):
+    # list of {column: value} objects
+    RECORDS = "records"
+    # {"columns": [...], "rows": [[...], ...]}, column names sent once
+    COLUMNAR = "columnar"
 
 
 class DbOperation(BaseModel):
     type: DbType = Field(description="Type of database operation")
-    query: str = Field(description="SQL query to execute")
+    query: Optional[str] = Field(
+        default=None, description="SQL query to execute (required for every type except copy)"
+    )
     parameters: Optional[List] = Field(
         default=None, description="Parameters for the SQL query, if needed"
     )
+    parameters_list: Optional[List[List]] = Field(
+        default=None,
+        description="For executemany: one list of parameters per execution of the query, sent in a single round-trip",
+    )
+    table_name: Optional[str] = Field(
+        default=None, description="For copy: table to bulk load `records` into"
+    )
+    columns: Optional[List[str]] = Field(
+        default=None, description="For copy: column names matching each record, defaults to all columns"
+    )
+    records: Optional[List[List]] = Field(
+        default=None, description="For copy: rows to bulk load with COPY"
+    )
+    max_rows: int = Field(
+        default=1000, description="For query: maximum number of rows to return"
+    )
+    max_bytes: int = Field(
+        default=100_000, description="For query: maximum JSON size of the returned rows"
+    )
+    result_format: ResultFormat = Field(
+        default=ResultFormat.RECORDS,
+        description="For query: `records` (one object per row) or the more compact `columnar` (column names once, rows as arrays)",
+    )
 
 
 class DatabaseToolInput(BaseModel):
@@ -28,29 +65,158 @@ class DatabaseToolInput(BaseModel):
     operations: List[DbOperation] = Field(
         description="List of database operations to perform"
     )
+    transaction: bool = Field(
+        default=False,
+        description="Run all operations in one transaction that is rolled back if any of them fails",
+    )
 
 
 class DatabaseTool(BaseTool):
     input_model = DatabaseToolInput
     description = "Perform various database operations."
 
+    # Pools are kept per DSN for the lifetime of the toolkit
+    max_pools = 4
+    pool_max_size = 5
+    # Seconds before an idle connection, or a whole unused pool, is closed
+    idle_timeout = 300.0
+    # Rows pulled from a query cursor per round-trip
+    fetch_batch_size = 500
+
+    def __init__(self, toolkit):
+        super().__init__(toolkit)
+        # dsn -> (pool, last used), least recently used first
+        self.pools: OrderedDict[str, tuple[asyncpg.Pool, float]] = OrderedDict()
+        self.pools_lock = asyncio.Lock()
+
     async def execute(self, input_data: DatabaseToolInput) -> str:
         results = []
-        conn = None
         try:
-            conn = await asyncpg.connect(input_data.dsn)
-            for operation in input_data.operations:
-                params = operation.parameters or []
-                if operation.type == DbType.QUERY:
-                    fetched = await conn.fetch(operation.query, *params)
-                    # Serialize asyncpg.Record objects
-                    results.append([dict(record) for record in fetched])
+            pool = await self.get_pool(input_data.dsn)
+            async with pool.acquire() as conn:
+                if input_data.transaction:
+                    async with conn.transaction():
+                        for operation in input_data.operations:
+                            results.append(await self.run_operation(conn, operation))
                 else:
-                    result = await conn.execute(operation.query, *params)
-                    results.append(result)
-            return json.dumps(results)
+                    for operation in input_data.operations:
+                        results.append(await self.run_operation(conn, operation))
+            return json.dumps(results, default=str)
         except Exception as e:
+            if input_data.transaction:
+                return f"Database operation failed, transaction rolled back: {e}"
             return f"Database operation failed: {e}"
-        finally:
-            if conn:
-                await conn.close()
+
+    async def run_operation(self, conn: asyncpg.Connection, operation: DbOperation):
+        params = operation.parameters or []
+        if operation.type == DbType.COPY:
+            if not operation.table_name or operation.records is None:
+                raise ValueError("copy requires table_name and records")
+            return await conn.copy_records_to_table(
+                operation.table_name,
+                records=[tuple(record) for record in operation.records],
+                columns=operation.columns,
+            )
+
+        if not operation.query:
+            raise ValueError(f"{operation.type.value} requires a query")
+        if operation.type == DbType.QUERY:
+            # Cursors only exist inside a transaction
+            if conn.is_in_transaction():
+                return await self.run_query(conn, operation, params)
+            async with conn.transaction():
+                return await self.run_query(conn, operation, params)
+        elif operation.type == DbType.EXECUTEMANY:
+            if operation.parameters_list is None:
+                raise ValueError("executemany requires parameters_list")
+            await conn.executemany(operation.query, operation.parameters_list)
+            return f"EXECUTEMANY {len(operation.parameters_list)}"
+        else:
+            return await conn.execute(operation.query, *params)
+
+    async def run_query(
+        self, conn: asyncpg.Connection, operation: DbOperation, params: List
+    ):
+        statement = await conn.prepare(operation.query)
+        columns = [attribute.name for attribute in statement.get_attributes()]
+        cursor = await statement.cursor(*params)
+
+        rows = []
+        size = 0
+        skipped = 0
+        truncated = False
+        while not truncated:
+            batch = await cursor.fetch(
+                min(self.fetch_batch_size, operation.max_rows - len(rows) + 1)
+            )
+            if not batch:
+                break
+            for i, record in enumerate(batch):
+                values = list(record.values())
+                row_size = len(json.dumps(values, default=str))
+                if len(rows) == operation.max_rows or size + row_size > operation.max_bytes:
+                    truncated = True
+                    skipped = len(batch) - i
+                    break
+                rows.append(values)
+                size += row_size
+
+        row_count = len(rows)
+        if truncated:
+            # Count the remaining rows server-side without transferring them
+            row_count += skipped
+            while moved := await cursor.forward(self.fetch_batch_size * 100):
+                row_count += moved
+
+        if operation.result_format == ResultFormat.COLUMNAR:
+            return {
+                "columns": columns,
+                "rows": rows,
+                "row_count": row_count,
+                "truncated": truncated,
+            }
+
+        records = [dict(zip(columns, row)) for row in rows]
+        if not truncated:
+            return records
+        return {
+            "records": records,
+            "row_count": row_count,
+            "returned_rows": len(rows),
+            "truncated": True,
+        }
+
+    async def get_pool(self, dsn: str) -> asyncpg.Pool:
+        async with self.pools_lock:
+            now = time.monotonic()
+            expired = [
+                key
+                for key, (_, last_used) in self.pools.items()
+                if key != dsn and now - last_used > self.idle_timeout
+            ]
+            for key in expired:
+                await self.close_pool(key)
+
+            if dsn in self.pools:
+                pool, _ = self.pools[dsn]
+                self.pools.move_to_end(dsn)
+            else:
+                pool = await asyncpg.create_pool(
+                    dsn,
+                    min_size=0,
+                    max_size=self.pool_max_size,
+                    max_inactive_connection_lifetime=self.idle_timeout,
+                )
+                while len(self.pools) >= self.max_pools:
+                    await self.close_pool(next(iter(self.pools)))
+            self.pools[dsn] = (pool, now)
+            return pool
+
+    async def close_pool(self, dsn: str):
+        pool, _ = self.pools.pop(dsn)
+        await pool.close()
+
+    async def aclose(self):
+        async with self.pools_lock:
+            while self.pools:
+                await self.close_pool(next(iter(self.pools)))
@@ -15,6 +15,8 @@ class ExecToolInput(BaseModel):
 class ExecTool(BaseTool):
     input_model = ExecToolInput
     description = "Execute the given Python source code. Note that variable and function definitions and modifications persist across calls to ExecTool."
+    # Swaps out sys.stdout and shares one namespace, so it runs on the loop one call at a time
+    max_concurrency = 1
 
     def __init__(self, toolkit):
         super().__init__(toolkit)
@@ -1,11 +1,17 @@
 from tools.base_tool import BaseTool
+from tools.file_walker import mapped, walk
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List, Set, Tuple
+from collections import deque
+from contextlib import ExitStack
 from pathlib import Path
 from enum import Enum
 import traceback
 from rich import print
+import threading
+import tempfile
+import re
 import os
 
 
@@ -15,53 +21,464 @@ class FileOperationType(Enum):
     INSERT_LINE = "INSERT_LINE"
     UPDATE_LINE = "UPDATE_LINE"
     DELETE_LINE = "DELETE_LINE"
+    READ_RANGE = "READ_RANGE"
+    SEARCH = "SEARCH"
+    APPLY_PATCH = "APPLY_PATCH"
 
 
 class FileOperation(BaseModel):
     operation_type: FileOperationType = Field(description="Type of file operation")
     path: str = Field(description="Path of the file to operate on")
     content: Optional[str] = Field(
-        description="New file content for create / insert_line / update_line",
+        description="New file content for create / insert_line / update_line, or the unified diff for apply_patch",
         default=None,
     )
     line_number: Optional[int] = Field(
-        description="Line number of file operation for line-specific operations",
+        description="0-based line number for line-specific operations, and the first line for read_range. All line numbers refer to the file as it was before this call (or as written by an earlier CREATE, APPLY_PATCH or READ_RANGE/SEARCH of the same file in the call), so earlier inserts and deletes never shift them. INSERT_LINE puts the new line before this line; use the line count to append.",
         default=None,
     )
+    end_line: Optional[int] = Field(
+        description="0-based line number read_range stops before; defaults to 200 lines after line_number",
+        default=None,
+    )
+    byte_offset: Optional[int] = Field(
+        description="Byte offset for read_range, instead of line_number; reads byte_count bytes",
+        default=None,
+    )
+    byte_count: Optional[int] = Field(
+        description="Number of bytes read_range reads from byte_offset", default=None
+    )
+    pattern: Optional[str] = Field(
+        description="Regular expression for search; `path` may be a file or a directory", default=None
+    )
+    context_lines: int = Field(description="Lines of context around each search match", default=2)
+    max_matches: int = Field(description="Maximum number of search matches returned", default=50)
 
 
 class FileToolInput(BaseModel):
     operations: List[FileOperation]
 
 
+# Largest READ_RANGE result, so a long line range can't flood the context
+MAX_READ_BYTES = 100_000
+DEFAULT_READ_LINES = 200
+
+
+class FileOperationError(Exception):
+    pass
+
+
+class PendingFile:
+    """Line edits to one file, collected against its original lines and applied in one pass."""
+
+    def __init__(self, content: Optional[str]) -> None:
+        # None when the file is to be deleted
+        self.exists = content is not None
+        content = content or ""
+        self.trailing_newline = content.endswith("\n")
+        self.lines = content[:-1].split("\n") if self.trailing_newline else content.split("\n")
+        if content == "":
+            self.lines = []
+        self.inserts: Dict[int, List[str]] = {}
+        self.updates: Dict[int, str] = {}
+        self.deletes: Set[int] = set()
+        self.dirty = False
+
+    def check(self, line_number: Optional[int], upper: int):
+        if not self.exists:
+            raise FileOperationError("file does not exist")
+        if line_number is None or not 0 <= line_number < upper:
+            raise FileOperationError(
+                f"line_number {line_number} out of range for a file with {len(self.lines)} lines"
+            )
+
+    def insert(self, line_number: Optional[int], content: Optional[str]):
+        self.check(line_number, len(self.lines) + 1)
+        # Several inserts at one position keep the order they were given in
+        self.inserts.setdefault(line_number, []).append(content or "")
+        self.dirty = True
+
+    def update(self, line_number: Optional[int], content: Optional[str]):
+        self.check(line_number, len(self.lines))
+        if line_number in self.deletes:
+            raise FileOperationError(f"line {line_number} was already deleted")
+        self.updates[line_number] = content or ""
+        self.dirty = True
+
+    def delete(self, line_number: Optional[int]):
+        self.check(line_number, len(self.lines))
+        self.deletes.add(line_number)
+        self.dirty = True
+
+    def flushed(self) -> "PendingFile":
+        """Apply the edits so far; later line numbers refer to the result."""
+        flushed = PendingFile(self.render() if self.exists else None)
+        flushed.dirty = self.dirty
+        return flushed
+
+    def render(self) -> str:
+        lines = []
+        for i, line in enumerate(self.lines):
+            lines += self.inserts.get(i, ())
+            if i not in self.deletes:
+                lines.append(self.updates.get(i, line))
+        lines += self.inserts.get(len(self.lines), ())
+        if not lines:
+            return ""
+        return "\n".join(lines) + ("\n" if self.trailing_newline else "")
+
+
 class FileTool(BaseTool):
     input_model = FileToolInput
-    description = "Execute a sequence of file operations"
+    description = "Execute a sequence of file operations: create, delete and edit files by line or with a unified diff, read line or byte ranges of large files, and search files with a regular expression"
+    blocking = True
+
+    read_operations = {FileOperationType.READ_RANGE, FileOperationType.SEARCH}
+
+    def __init__(self, toolkit):
+        super().__init__(toolkit)
+        # Calls run on worker threads; calls touching the same file take turns
+        self.path_locks: Dict[str, threading.Lock] = {}
+        self.path_locks_guard = threading.Lock()
+
+    def is_read_only(self, input_data: FileToolInput) -> bool:
+        return all(op.operation_type in self.read_operations for op in input_data.operations)
 
     async def execute(self, input_data: FileToolInput) -> str:
+        paths = {os.path.realpath(op.path) for op in input_data.operations}
+        with ExitStack() as stack:
+            # Always acquired in sorted order, so calls with overlapping paths can't deadlock
+            for path in sorted(paths):
+                stack.enter_context(self.path_lock(path))
+            return self.run(input_data)
+
+    def path_lock(self, path: str) -> threading.Lock:
+        with self.path_locks_guard:
+            return self.path_locks.setdefault(path, threading.Lock())
+
+    def run(self, input_data: FileToolInput) -> str:
+        # path -> pending state; every file is read at most once and written at most once
+        pending: Dict[str, PendingFile] = {}
+        outputs = []
+        for i, op in enumerate(input_data.operations):
+            try:
+                output = self.apply(op, pending)
+            except (FileOperationError, OSError, re.error) as e:
+                # Nothing is written until every operation has been checked
+                return f"Error in operation {i} ({op.operation_type.value} {op.path}), no files were changed: {e}"
+            if output is not None:
+                outputs.append(output)
+
         try:
-            for op in input_data.operations:
-                match op.operation_type:
-                    case FileOperationType.CREATE:
-                        with open(op.path, "w") as file:
-                            file.write(op.content or "")
-                    case FileOperationType.DELETE:
-                        Path(op.path).unlink(missing_ok=True)
-                    case FileOperationType.INSERT_LINE:
-                        content = Path(op.path).read_text().splitlines()
-                        content.insert(op.line_number, op.content)
-                        Path(op.path).write_text("\n".join(content))
-                    case FileOperationType.UPDATE_LINE:
-                        content = Path(op.path).read_text().splitlines()
-                        content[op.line_number] = op.content
-                        Path(op.path).write_text("\n".join(content))
-                    case FileOperationType.DELETE_LINE:
-                        content = Path(op.path).read_text().splitlines()
-                        del content[op.line_number]
-                        Path(op.path).write_text("\n".join(content))
-            return "File operations executed successfully."
+            for path, pending_file in pending.items():
+                self.commit(path, pending_file)
         except Exception as e:
             print(f"Error executing file operations: {e} {traceback.format_exc()}")
+            return f"Error executing file operations: {e}"
+        if len(outputs) == len(input_data.operations):
+            return "\n\n".join(outputs)
+        return "\n\n".join(["File operations executed successfully."] + outputs)
+
+    def apply(self, op: FileOperation, pending: Dict[str, PendingFile]) -> Optional[str]:
+        # Keyed like the locks, so `a.txt` and `./a.txt` share one pending file
+        key = os.path.realpath(op.path)
+        match op.operation_type:
+            case FileOperationType.CREATE:
+                pending[key] = PendingFile(op.content or "")
+                pending[key].dirty = True
+            case FileOperationType.DELETE:
+                pending[key] = PendingFile(None)
+                pending[key].dirty = True
+            case FileOperationType.INSERT_LINE:
+                self.load(op.path, pending).insert(op.line_number, op.content)
+            case FileOperationType.UPDATE_LINE:
+                self.load(op.path, pending).update(op.line_number, op.content)
+            case FileOperationType.DELETE_LINE:
+                self.load(op.path, pending).delete(op.line_number)
+            case FileOperationType.APPLY_PATCH:
+                if not op.content:
+                    raise FileOperationError("APPLY_PATCH requires the diff in content")
+                current = self.load(op.path, pending, missing_ok=True).flushed()
+                lines, trailing_newline = apply_patch(current.lines, current.trailing_newline, op.content)
+                patched = PendingFile("\n".join(lines) + ("\n" if trailing_newline and lines else ""))
+                patched.dirty = True
+                pending[key] = patched
+            case FileOperationType.READ_RANGE:
+                return self.read_range(op, self.flush(op.path, pending))
+            case FileOperationType.SEARCH:
+                if not op.pattern:
+                    raise FileOperationError("SEARCH requires a pattern")
+                return self.search(op, pending)
+
+    def load(self, path: str, pending: Dict[str, PendingFile], missing_ok: bool = False) -> PendingFile:
+        key = os.path.realpath(path)
+        if key not in pending:
+            if missing_ok and not os.path.exists(key):
+                return PendingFile("")
+            pending[key] = PendingFile(Path(key).read_text())
+        return pending[key]
+
+    def flush(self, path: str, pending: Dict[str, PendingFile]) -> Optional[PendingFile]:
+        """Bring the pending edits of `path` up to date so a read sees them; None if it has none."""
+        key = os.path.realpath(path)
+        if key not in pending or not pending[key].dirty:
+            return None
+        pending[key] = pending[key].flushed()
+        if not pending[key].exists:
+            raise FileOperationError("file was deleted earlier in this call")
+        return pending[key]
+
+    def read_range(self, op: FileOperation, pending_file: Optional[PendingFile]) -> str:
+        if op.byte_offset is not None:
+            if op.byte_offset < 0:
+                raise FileOperationError(f"byte_offset {op.byte_offset} is negative")
+            count = min(op.byte_count or MAX_READ_BYTES, MAX_READ_BYTES)
+            if pending_file is not None:
+                data = pending_file.render().encode()[op.byte_offset : op.byte_offset + count]
+            else:
+                with mapped(op.path) as content:
+                    data = content[op.byte_offset : op.byte_offset + count]
+            end = op.byte_offset + len(data)
+            header = f"--- {op.path} bytes {op.byte_offset}-{end} ---"
+            return header + "\n" + data.decode("utf-8", errors="replace")
+
+        start = op.line_number or 0
+        end = op.end_line if op.end_line is not None else start + DEFAULT_READ_LINES
+        if start < 0 or end < start:
+            raise FileOperationError(f"invalid line range {start}-{end}")
+        if pending_file is not None:
+            data = "".join(line + "\n" for line in pending_file.lines[start:end]).encode()
+        else:
+            # Only the pages up to `end` are touched, however large the file
+            with mapped(op.path) as content:
+                first = line_offset(content, start)
+                last = min(line_offset(content, end, first, start), first + MAX_READ_BYTES + 1)
+                data = content[first:last]
+
+        truncated = len(data) > MAX_READ_BYTES
+        lines = data[:MAX_READ_BYTES].decode("utf-8", errors="replace").split("\n")
+        if truncated or lines[-1] == "":
+            # The partial last line, or the empty string after the final newline
+            lines.pop()
+        lines = [line.rstrip("\r") for line in lines]
+        body = "\n".join(f"{n:>6}  {line}" for n, line in enumerate(lines, start=start))
+        header = f"--- {op.path} lines {start}-{start + len(lines)} ---"
+        note = f"\n--- truncated at {MAX_READ_BYTES} bytes ---" if truncated else ""
+        return header + "\n" + body + note
+
+    def search(self, op: FileOperation, pending: Dict[str, PendingFile]) -> str:
+        regex = re.compile(op.pattern)
+        if os.path.isdir(op.path):
+            paths = [os.path.join(op.path, path) for path in walk(op.path, ["*"])]
+        else:
+            paths = [op.path]
+
+        results, count = [], 0
+        for path in paths:
+            key = os.path.realpath(path)
+            if key in pending and not pending[key].exists and len(paths) > 1:
+                continue
+            pending_file = self.flush(path, pending)
+            if pending_file is not None:
+                found = search_lines(path, pending_file.lines, regex, op.context_lines, op.max_matches - count)
+            else:
+                if len(paths) > 1 and is_binary(path):
+                    continue
+                # Streamed line by line, so only the context window is held in memory
+                with open(path, encoding="utf-8", errors="replace", newline="") as fp:
+                    lines = (line.rstrip("\r\n") for line in fp)
+                    found = search_lines(path, lines, regex, op.context_lines, op.max_matches - count)
+            if results and found:
+                results.append(None)
+            results += found
+            count += sum(1 for line in found if line is not None and line[1])
+            if count >= op.max_matches:
+                break
+
+        header = f"--- search {op.pattern!r} in {op.path}: {count} matches"
+        header += " (stopped at max_matches) ---" if count >= op.max_matches else " ---"
+        body = "\n".join("--" if line is None else line[0] for line in results)
+        return header + ("\n" + body if body else "")
+
+    def commit(self, path: str, pending_file: PendingFile):
+        if not pending_file.dirty:
+            return
+        if not pending_file.exists:
+            Path(path).unlink(missing_ok=True)
+            return
+        write_atomic(path, pending_file.render())
+
+
+def line_offset(content, line: int, offset: int = 0, offset_line: int = 0) -> int:
+    """Byte offset where 0-based `line` starts, counting on from `offset`, which starts `offset_line`."""
+    chunk_size = 1 << 20
+    while offset_line < line:
+        chunk = content[offset : offset + chunk_size]
+        if not chunk:
+            return len(content)
+        newlines = chunk.count(b"\n")
+        if offset_line + newlines < line:
+            # Skip whole chunks without looking at individual lines
+            offset_line += newlines
+            offset += len(chunk)
+            continue
+        for _ in range(line - offset_line):
+            offset = content.find(b"\n", offset) + 1
+            if offset == 0:
+                # Past the last line
+                return len(content)
+        return offset
+    return offset
+
+
+def is_binary(path: str) -> bool:
+    with open(path, "rb") as fp:
+        return b"\0" in fp.read(1024)
+
+
+def search_lines(
+    path: str, lines: Iterable[str], regex: re.Pattern, context: int, max_matches: int
+) -> List[Optional[Tuple[str, bool]]]:
+    """grep-style results: `(line, is_match)` tuples, with None separating non-adjacent groups."""
+    results: List[Optional[Tuple[str, bool]]] = []
+    before = deque(maxlen=context)
+    after, last_shown, matches = 0, None, 0
+    for n, line in enumerate(lines):
+        if matches < max_matches and regex.search(line):
+            if last_shown is not None and n - len(before) > last_shown + 1:
+                results.append(None)
+            for m, previous in before:
+                results.append((f"{path}-{m}-{previous}", False))
+            before.clear()
+            results.append((f"{path}:{n}:{line}", True))
+            matches += 1
+            after, last_shown = context, n
+        elif after:
+            results.append((f"{path}-{n}-{line}", False))
+            after -= 1
+            last_shown = n
+        elif matches >= max_matches:
+            break
+        else:
+            before.append((n, line))
+    return results
+
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def parse_patch(patch: str) -> List[Tuple[int, int, List[str], List[str], Optional[bool]]]:
+    """Hunks of a single-file unified diff as `(old_start, old_count, old_lines, new_lines, trailing_newline)`.
+
+    `trailing_newline` is None unless the hunk says whether the result ends in a newline.
+    """
+    hunks = []
+    lines = patch.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    files, i = 0, 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if line.startswith("+++ "):
+            files += 1
+            if files > 1:
+                raise FileOperationError("the patch changes more than one file; use one APPLY_PATCH per file")
+            continue
+        match = HUNK_HEADER.match(line)
+        if not match:
+            # Headers and other preamble, as produced by diff and git
+            continue
+        old_start, old_count = int(match[1]), int(match[2] if match[2] is not None else 1)
+        new_count = int(match[4] if match[4] is not None else 1)
+        old, new, trailing_newline, last = [], [], None, None
+        while i < len(lines) and (
+            len(old) < old_count or len(new) < new_count or lines[i].startswith("\\")
+        ):
+            line = lines[i]
+            i += 1
+            if line.startswith("\\"):
+                # "\ No newline at end of file" applies to the line before it
+                if last in (" ", "+"):
+                    trailing_newline = False
+                elif last == "-" and trailing_newline is None:
+                    trailing_newline = True
+                continue
+            kind, text = (line[0], line[1:]) if line else (" ", "")
+            if kind == " ":
+                old.append(text)
+                new.append(text)
+            elif kind == "-":
+                old.append(text)
+            elif kind == "+":
+                new.append(text)
+            else:
+                raise FileOperationError(f"unexpected line in hunk {len(hunks) + 1}: {line!r}")
+            last = kind
+        if len(old) != old_count or len(new) != new_count:
+            raise FileOperationError(f"hunk {len(hunks) + 1} is shorter than its header says")
+        hunks.append((old_start, old_count, old, new, trailing_newline))
+    if not hunks:
+        raise FileOperationError("no hunks found in the patch")
+    return hunks
+
+
+def apply_patch(lines: List[str], trailing_newline: bool, patch: str) -> Tuple[List[str], bool]:
+    """Apply a unified diff to `lines`, tolerating hunks that moved since the diff was made."""
+    result: List[str] = []
+    position, shift = 0, 0
+    if not lines:
+        # A new file ends in a newline unless the patch says otherwise
+        trailing_newline = True
+    for number, (old_start, old_count, old, new, hunk_newline) in enumerate(parse_patch(patch), start=1):
+        # A hunk that only adds lines starts after line old_start, others at it
+        expected = (old_start if old_count == 0 else old_start - 1) + shift
+        found = None
+        for distance in range(len(lines) + 1):
+            for candidate in (expected - distance, expected + distance):
+                if position <= candidate <= len(lines) - len(old) and lines[candidate : candidate + len(old)] == old:
+                    found = candidate
+                    break
+            if found is not None:
+                break
+        if found is None:
+            raise FileOperationError(f"hunk {number} (@@ -{old_start},{old_count} @@) does not match the file")
+        result += lines[position:found] + new
+        position = found + len(old)
+        shift = found - (expected - shift)
+        if hunk_newline is not None:
+            trailing_newline = hunk_newline
+    result += lines[position:]
+    return result, trailing_newline
+
+
+def current_umask() -> int:
+    # The only portable way to read the umask is to set it
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+UMASK = current_umask()
+
+
+def write_atomic(path: str, content: str):
+    # Write next to the target and rename over it, so readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fp:
+            fp.write(content)
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            # mkstemp creates 0600 files; give new files the mode open() would
+            mode = 0o666 & ~UMASK
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+from fnmatch import fnmatch
+import mmap
+import re
+import os
+
+# Never descended into, whatever the ignore files say
+ALWAYS_SKIPPED = {".git"}
+
+
+@contextmanager
+def mapped(path: str):
+    """Yield the file's contents as a read-only mmap, so large files are paged in only as needed."""
+    with open(path, "rb") as fp:
+        # Empty files can't be mapped
+        if os.fstat(fp.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            yield content
+
+
+def translate_gitignore(pattern: str) -> Optional[Tuple[re.Pattern, bool, bool]]:
+    """Compile one .gitignore line into `(regex, negated, directory_only)`, None for blanks and comments."""
+    pattern = pattern.rstrip("\n").rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negated = pattern.startswith("!")
+    if negated:
+        pattern = pattern[1:]
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1 :]:
+            end = pattern.index("]", i + 1)
+            regex += "[" + pattern[i + 1 : end].replace("!", "^", 1) + "]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return re.compile(regex), negated, directory_only
+
+
+class IgnoreRules:
+    def __init__(self, rules: Optional[List[Tuple[str, re.Pattern, bool, bool]]] = None) -> None:
+        # (base directory, regex, negated, directory_only), outermost .gitignore first
+        self.rules = rules or []
+
+    def extend(self, directory: str, root: str) -> "IgnoreRules":
+        path = os.path.join(root, directory, ".gitignore")
+        try:
+            with open(path) as fp:
+                lines = fp.readlines()
+        except OSError:
+            return self
+        rules = [
+            (directory, *compiled) for compiled in map(translate_gitignore, lines) if compiled
+        ]
+        return IgnoreRules(self.rules + rules) if rules else self
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        # Later rules override earlier ones, so the last match wins
+        result = False
+        for base, regex, negated, directory_only in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if base:
+                if not path.startswith(base + "/"):
+                    continue
+                relative = path[len(base) + 1 :]
+            else:
+                relative = path
+            if regex.fullmatch(relative):
+                result = not negated
+        return result
+
+
+def matches(patterns: List[str], path: str) -> bool:
+    # Patterns without a slash match the file name at any depth
+    name = path.rsplit("/", 1)[-1]
+    return any(fnmatch(path if "/" in pattern else name, pattern) for pattern in patterns)
+
+
+def walk(
+    root: str,
+    include: List[str],
+    exclude: Optional[List[str]] = None,
+    respect_gitignore: bool = True,
+) -> List[str]:
+    """Return the `/`-separated paths under `root` matching `include`, in sorted order.
+
+    Excluded and ignored directories are pruned without being listed.
+    """
+    exclude = exclude or []
+    paths = []
+
+    def visit(directory: str, rules: IgnoreRules):
+        if respect_gitignore:
+            rules = rules.extend(directory, root)
+        try:
+            entries = sorted(os.scandir(os.path.join(root, directory)), key=lambda entry: entry.name)
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name in ALWAYS_SKIPPED:
+                continue
+            path = f"{directory}/{entry.name}" if directory else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if rules.ignored(path, is_dir) or matches(exclude, path):
+                continue
+            if is_dir:
+                visit(path, rules)
+            elif entry.is_file() and matches(include, path):
+                paths.append(path)
+
+    visit("", IgnoreRules())
+    return paths
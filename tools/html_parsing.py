@@ -0,0 +1,61 @@
+from functools import lru_cache
+from typing import Dict, List, Optional
+import importlib.util
+import soupsieve
+
+# Fastest first; html.parser ships with Python and is always available
+PARSER_BACKENDS = ["selectolax", "lxml", "html.parser"]
+
+
+def backend_available(backend: str) -> bool:
+    match backend:
+        case "selectolax":
+            return importlib.util.find_spec("selectolax") is not None
+        case "lxml":
+            return importlib.util.find_spec("lxml") is not None
+        case "html.parser":
+            return True
+    return False
+
+
+def available_backends() -> List[str]:
+    return [backend for backend in PARSER_BACKENDS if backend_available(backend)]
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    if backend and backend_available(backend):
+        return backend
+    return available_backends()[0]
+
+
+@lru_cache(maxsize=512)
+def compile_selector(selector: str) -> soupsieve.SoupSieve:
+    # Selectors repeat across tasks and calls, so parse each one only once
+    return soupsieve.compile(selector)
+
+
+def extract_data_points(
+    content: bytes, data_points: Dict[str, str], backend: Optional[str] = None
+) -> Dict[str, List[str]]:
+    """Parse `content` and return the stripped text of every element matching each selector.
+
+    This is CPU-bound, so callers should run it off the event loop.
+    """
+    backend = resolve_backend(backend)
+
+    if backend == "selectolax":
+        from selectolax.lexbor import LexborHTMLParser
+
+        tree = LexborHTMLParser(content)
+        return {
+            name: [node.text(strip=True) for node in tree.css(selector)]
+            for name, selector in data_points.items()
+        }
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, "lxml" if backend == "lxml" else "html.parser")
+    return {
+        name: [elem.get_text(strip=True) for elem in compile_selector(selector).select(soup)]
+        for name, selector in data_points.items()
+    }
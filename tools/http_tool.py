@@ -1,11 +1,13 @@
 from tools.base_tool import BaseTool
 
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from enum import Enum
+import hashlib
 import asyncio
 import httpx
 import json
+import os
 
 
 class HttpRequestType(Enum):
@@ -22,33 +24,144 @@ class HttpRequest(BaseModel):
     headers: Optional[Dict[str, str]] = Field(
         description="Optional headers for request", default=None
     )
+    max_bytes: int = Field(
+        default=100_000,
+        description="Maximum number of body bytes returned, longer text bodies are truncated",
+    )
+    save_to: Optional[str] = Field(
+        default=None,
+        description="Write the full body to this path and return its path, size and sha256 instead of the content. Use this for large or binary downloads.",
+    )
 
 
 class HttpToolInput(BaseModel):
     requests: List[HttpRequest]
 
 
+# Content types whose bodies are returned as text; anything else is treated as binary
+TEXT_CONTENT_TYPES = ("text/", "json", "xml", "javascript", "x-www-form-urlencoded")
+
+
 class HttpTool(BaseTool):
     input_model = HttpToolInput
     description = "Get the HTTP response from a given GET or POST request"
+    # Hard limit on what save_to will write to disk
+    max_download_bytes = 1024 * 1024 * 1024
 
     async def execute(self, input_data: HttpToolInput) -> str:
-        async with httpx.AsyncClient() as client:
-            tasks = []
-            for request in input_data.requests:
-                match request.request_type:
-                    case HttpRequestType.GET:
-                        tasks.append(client.get(request.url, headers=request.headers))
-                    case HttpRequestType.POST:
-                        tasks.append(
-                            client.post(
-                                request.url,
-                                headers=request.headers,
-                                json=request.payload,
-                            )
-                        )
-
-            responses = await asyncio.gather(*tasks)
-            response_contents = [response.content.decode() for response in responses]
+        client = self.toolkit.http_clients.get()
+        response_contents = await asyncio.gather(
+            *(self.fetch(client, request) for request in input_data.requests)
+        )
 
         return json.dumps(response_contents)
+
+    def is_read_only(self, input_data: HttpToolInput) -> bool:
+        # POSTs and downloads to disk have side effects
+        return all(
+            request.request_type == HttpRequestType.GET and not request.save_to
+            for request in input_data.requests
+        )
+
+    async def fetch(self, client: httpx.AsyncClient, request: HttpRequest) -> str | Dict:
+        headers = dict(request.headers or {})
+        cache = self.toolkit.http_cache
+        cacheable = request.request_type == HttpRequestType.GET and not request.save_to
+        key = entry = None
+        if cacheable:
+            key, entry, cached = cache.lookup_request(request.url, headers)
+            if cached:
+                return self.render(cached, request)
+
+        async with client.stream(
+            request.request_type.value,
+            request.url,
+            headers=headers,
+            json=request.payload
+            if request.request_type == HttpRequestType.POST
+            else None,
+        ) as response:
+            if entry and response.status_code == 304:
+                cache.revalidations += 1
+                cache.refresh(key, entry, response)
+                return self.render(cache.to_response(key, entry), request)
+
+            if request.save_to:
+                return await self.spill(response, request.save_to)
+            if not self.is_text(response):
+                return self.describe_binary(response)
+
+            body, complete = await self.read_capped(response, request.max_bytes)
+            if cacheable:
+                cache.misses += 1
+                if key and complete:
+                    cache.store(key, request.url, response, body)
+            return self.decode(body, response, complete)
+
+    async def read_capped(self, response: httpx.Response, max_bytes: int) -> Tuple[bytes, bool]:
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > max_bytes:
+                # Stop downloading; leaving the context manager closes the stream
+                return b"".join(chunks)[:max_bytes], False
+        return b"".join(chunks), True
+
+    async def spill(self, response: httpx.Response, path: str) -> Dict:
+        digest = hashlib.sha256()
+        size = 0
+        truncated = False
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as fp:
+            async for chunk in response.aiter_bytes():
+                if size + len(chunk) > self.max_download_bytes:
+                    chunk = chunk[: self.max_download_bytes - size]
+                    truncated = True
+                fp.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                if truncated:
+                    break
+        return {
+            "status_code": response.status_code,
+            "content_type": response.headers.get("content-type"),
+            "path": path,
+            "size": size,
+            "sha256": digest.hexdigest(),
+            "truncated": truncated,
+        }
+
+    def render(self, response: httpx.Response, request: HttpRequest) -> str | Dict:
+        # A response whose full body is already in memory, e.g. served from the cache
+        if not self.is_text(response):
+            return self.describe_binary(response)
+        body = response.content
+        complete = len(body) <= request.max_bytes
+        return self.decode(body[: request.max_bytes], response, complete)
+
+    def is_text(self, response: httpx.Response) -> bool:
+        content_type = response.headers.get("content-type")
+        if not content_type:
+            return True
+        return any(marker in content_type.lower() for marker in TEXT_CONTENT_TYPES)
+
+    def describe_binary(self, response: httpx.Response) -> Dict:
+        return {
+            "status_code": response.status_code,
+            "content_type": response.headers.get("content-type"),
+            "content_length": response.headers.get("content-length"),
+            "note": "Binary body not returned; repeat the request with save_to to download it",
+        }
+
+    def decode(self, body: bytes, response: httpx.Response, complete: bool) -> str:
+        text = body.decode(response.charset_encoding or "utf-8", errors="replace")
+        if complete:
+            return text
+        total = response.headers.get("content-length")
+        return (
+            text
+            + f"\n[... truncated, body is {total + ' bytes' if total else 'larger than shown'}; use save_to for the full content ...]"
+        )
@@ -24,10 +24,14 @@ class MetaTool(BaseTool):
             return "I'm sorry but I cannot use the MetaTool to call the MetaTool as it might lead to infinite recursion."
         try:
             tool = self.toolkit.tools[tool_name]
+            # Input models ignore unknown fields, which would hide a misspelled argument
+            unknown = set(input_data.tool_args) - set(tool.input_model.model_fields)
+            if unknown:
+                return f"Error validating input {input_data.tool_args} for {tool_name}: unknown arguments {sorted(unknown)}"
             try:
                 tool_input = tool.input_model.model_validate(input_data.tool_args)
-                return await tool.execute(tool_input)
+                return await self.toolkit.run_tool(tool, tool_input)
             except ValidationError as e:
                 return f"Error validating input {input_data.tool_args} for {tool_name}: {e}"
         except KeyError:
-            return f"Error: Could not execute MetaTool: {tool_name} not found in {self.toolkit.tools.keys()=}"
+            return f"Error: Could not execute MetaTool: {tool_name} not found in {sorted(self.toolkit.tools)}"
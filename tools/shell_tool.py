@@ -1,9 +1,12 @@
 from tools.base_tool import BaseTool
 
-from typing import List, Optional, Dict
+from typing import List, Optional
 from pydantic import BaseModel, Field
-import subprocess
+import asyncio
+import signal
 import json
+import sys
+import os
 
 
 class ShellCommand(BaseModel):
@@ -12,40 +15,157 @@ class ShellCommand(BaseModel):
         default=None,
         description="Optional arguments to pass to command. If one argument is a string with spaces, make sure to enclose it within escaped double quotes.",
     )
+    timeout: Optional[float] = Field(
+        default=None,
+        description="Seconds after which this command is killed, overriding the tool-wide timeout",
+    )
 
 
 class ShellToolInput(BaseModel):
     commands: List[ShellCommand] = Field(
         description="List of shell commands to execute"
     )
+    concurrent: bool = Field(
+        default=False,
+        description="Run the commands at the same time instead of one after another. Only use this for independent commands.",
+    )
+    timeout: Optional[float] = Field(
+        default=300, description="Seconds after which each command is killed"
+    )
+    max_output_bytes: int = Field(
+        default=100_000,
+        description="Maximum bytes of stdout / stderr kept per command, the rest is truncated",
+    )
+    stream_output: bool = Field(
+        default=True, description="Echo stdout to the console while commands run"
+    )
+
+
+class CappedOutput:
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.data = bytearray()
+        self.total_bytes = 0
+
+    def append(self, chunk: bytes):
+        self.total_bytes += len(chunk)
+        room = self.max_bytes - len(self.data)
+        if room > 0:
+            self.data += chunk[:room]
+
+    def text(self) -> str:
+        text = self.data.decode(errors="replace")
+        if self.total_bytes > len(self.data):
+            text += f"\n[... truncated {self.total_bytes - len(self.data)} bytes ...]"
+        return text
 
 
 class ShellTool(BaseTool):
     input_model = ShellToolInput
     description = "Execute a list of shell commands and return stdout (and stderr if returncode is nonzero)"
+    # Longest partial line held back from the console echo
+    max_echo_line_bytes = 65536
 
     async def execute(self, input_data: ShellToolInput) -> str:
-        # input_data = ShellToolInput.model_validate_json(args)
         commands = input_data.commands
 
-        results = []
+        if input_data.concurrent:
+            results = await asyncio.gather(
+                *(
+                    self.run_command(
+                        shell_command,
+                        input_data,
+                        prefix=f"[{i}] " if len(commands) > 1 else "",
+                    )
+                    for i, shell_command in enumerate(commands)
+                )
+            )
+        else:
+            results = [
+                await self.run_command(shell_command, input_data)
+                for shell_command in commands
+            ]
+
+        return json.dumps(results)
+
+    async def run_command(
+        self, shell_command: ShellCommand, input_data: ShellToolInput, prefix: str = ""
+    ) -> str:
+        command_str = (
+            shell_command.command
+            + " "
+            + " ".join(shell_command.arguments if shell_command.arguments else [])
+        )
+        timeout = (
+            shell_command.timeout
+            if shell_command.timeout is not None
+            else input_data.timeout
+        )
+        stdout = CappedOutput(input_data.max_output_bytes)
+        stderr = CappedOutput(input_data.max_output_bytes)
 
-        for shell_command in commands:
-            command_str = (
-                shell_command.command
-                + " "
-                + " ".join(shell_command.arguments if shell_command.arguments else [])
+        process = await asyncio.create_subprocess_shell(
+            command_str,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            # Own process group, so a timeout also kills anything the shell spawned
+            start_new_session=True,
+        )
+        echo_prefix = prefix if input_data.stream_output else None
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    self.read_stream(process.stdout, stdout, echo_prefix),
+                    self.read_stream(process.stderr, stderr, None),
+                    process.wait(),
+                ),
+                timeout,
             )
-            result = subprocess.run(command_str, capture_output=True, shell=True)
+        except asyncio.TimeoutError:
+            self.kill(process)
+            await process.wait()
+            return f"Command timed out after {timeout}s! stdout={stdout.text()!r}, stderr={stderr.text()!r}"
+        except asyncio.CancelledError:
+            self.kill(process)
+            # Reap it, so no zombie is left behind
+            await process.wait()
+            raise
 
-            if result.returncode != 0:
-                results.append(
-                    f"Got error in shell command! {result.stdout=}, {result.stderr=}"
-                )
-            else:
-                results.append(result.stdout.decode())
+        if process.returncode != 0:
+            return f"Got error in shell command! returncode={process.returncode}, stdout={stdout.text()!r}, stderr={stderr.text()!r}"
+        return stdout.text()
 
-        return json.dumps(results)
+    async def read_stream(
+        self,
+        stream: asyncio.StreamReader,
+        output: CappedOutput,
+        echo_prefix: Optional[str],
+    ):
+        pending = b""
+        while chunk := await stream.read(65536):
+            output.append(chunk)
+            if echo_prefix is not None:
+                # Echo complete lines only, so concurrent commands don't interleave mid-line
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    self.echo(echo_prefix, line)
+                if len(pending) > self.max_echo_line_bytes:
+                    # Output without newlines would otherwise be buffered whole
+                    self.echo(echo_prefix, pending)
+                    pending = b""
+        if echo_prefix is not None and pending:
+            self.echo(echo_prefix, pending)
+
+    def echo(self, prefix: str, line: bytes):
+        sys.stdout.write(f"{prefix}{line.decode(errors='replace')}\n")
+        sys.stdout.flush()
+
+    def kill(self, process: asyncio.subprocess.Process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
 
 
 if __name__ == "__main__":
@@ -1,6 +1,11 @@
 from pydantic import BaseModel, Field
 from tools.base_tool import BaseTool
-from typing import Optional
+from tools.file_walker import mapped, matches, walk
+from context_budget import estimate_tokens
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
 import os
 
 
@@ -11,46 +16,220 @@ class SnapToolInput(BaseModel):
     infra_files: Optional[bool] = Field(
         default=False, description="Include infrastructure files in output"
     )
+    diff: Optional[bool] = Field(
+        default=False,
+        description="Only return files added, changed or deleted since the last snapshot",
+    )
+    include: List[str] = Field(
+        default=["*.py", "*.yml"],
+        description="Glob patterns of files to include, searched recursively; patterns without a / match file names at any depth",
+    )
+    exclude: List[str] = Field(
+        default=[], description="Glob patterns of files and directories to skip"
+    )
+    respect_gitignore: bool = Field(
+        default=True, description="Skip files ignored by .gitignore files"
+    )
+    priority: List[str] = Field(
+        default=[],
+        description="Glob patterns of files to include first when over budget, most important first. Other files follow, shallowest first",
+    )
+    low_priority: List[str] = Field(
+        default=["test_*.py", "*_test.py", "benchmarks/*"],
+        description="Glob patterns of files to include last when over budget",
+    )
+    max_bytes: Optional[int] = Field(
+        default=200_000,
+        description="Maximum size of the snapshot in bytes; lower priority files that don't fit are left out",
+    )
+    max_tokens: Optional[int] = Field(
+        default=None, description="Maximum size of the snapshot in tokens"
+    )
 
 
 class SnapTool(BaseTool):
     input_model = SnapToolInput
     description = "Concatenate and optionally annotate source code files with line numbers (possibly including infrastructure files)."
+    blocking = True
+    # Only regenerates state.txt from the sources
+    read_only = True
+    # Every call rewrites state.txt and the index, so calls take turns
+    max_concurrency = 1
+
+    def is_read_only(self, input_data: SnapToolInput) -> bool:
+        # A diff moves the baseline, and a speculative run can't be cancelled off the
+        # worker thread; run early, a diff the user never saw would be lost
+        return not input_data.diff
+
+    state_path = "state.txt"
+    # Per-file hashes keyed by mtime and size, plus what the last snapshots contained
+    index_path = os.path.join(".cache", "snap", "index.json")
+
+    # Threads reading and hashing files for one snapshot
+    read_workers = 8
+    infra_files = ["Dockerfile", "requirements.txt", ".github/workflows/*.yml"]
 
     async def execute(self, input_data: SnapToolInput) -> str:
-        concatenated_code = ""
-
-        dirs_to_include = ["tools", "tests"]
-        filetypes_to_include = [".py", ".yml"]
-
-        code_files = [path for path in os.listdir(os.getcwd()) if any(path.endswith(ft) for ft in filetypes_to_include)]
-        for source_dir in dirs_to_include:
-            code_files += [
-                os.path.join(source_dir, path)
-                for path in os.listdir(os.path.join(os.getcwd(), source_dir))
-                if any(path.endswith(ft) for ft in filetypes_to_include)
-            ]
+        index = self.load_index()
+        with ThreadPoolExecutor(max_workers=self.read_workers) as pool:
+            paths = self.list_files(input_data)
+            digests = pool.map(lambda path: self.file_hash(path, index["hashes"]), paths)
+            files = dict(zip(paths, digests))
+
+            if input_data.diff:
+                output = self.render_diff(pool, files, index.get("baseline", {}), input_data)
+            else:
+                output = self.snapshot(pool, files, index, input_data)
+
+        index["baseline"] = files
+        # Forget files that are no longer part of any snapshot
+        index["hashes"] = {path: index["hashes"][path] for path in files}
+        self.save_index(index)
+        return output
+
+    def list_files(self, input_data: SnapToolInput) -> List[str]:
+        include = list(input_data.include)
+        priority = list(input_data.priority)
         if input_data.infra_files:
-            code_files += [
-                "Dockerfile",
-                "requirements.txt",
-                ".github/workflows/pytest.yml",
-            ]
-
-        for file in code_files:
-            concatenated_code += f"--- {file} ---\n```\n"
-            with open(file, "r") as f:
-                if input_data.line_numbers:
-                    line_num = 1
-                    for line in f:
-                        concatenated_code += f"{line_num:>6}  {line}"
-                        line_num += 1
-                else:
-                    concatenated_code += f.read()
-
-            concatenated_code += "\n"
-
-        with open("state.txt", "w") as f:
-            f.write(concatenated_code)
-
-        return concatenated_code
+            include += self.infra_files
+            # Asked for explicitly, so they go in before anything else
+            priority = self.infra_files + priority
+        paths = walk(os.getcwd(), include, input_data.exclude, input_data.respect_gitignore)
+
+        def rank(path: str):
+            level = next(
+                (i for i, pattern in enumerate(priority) if matches([pattern], path)),
+                len(priority),
+            )
+            return level, matches(input_data.low_priority, path), path.count("/"), path
+
+        return sorted(paths, key=rank)
+
+    def fit_budget(
+        self, pool: ThreadPoolExecutor, paths: List[str], input_data: SnapToolInput
+    ) -> Tuple[List[Tuple[str, bytes]], List[str]]:
+        """Render `paths` in priority order, leaving out whatever would exceed the budget."""
+        max_bytes = input_data.max_bytes
+        if max_bytes is not None:
+            # Skip files that can't fit on size alone before reading them
+            candidates, remaining = [], max_bytes
+            for path in paths:
+                size = os.stat(path).st_size
+                if size <= remaining:
+                    candidates.append(path)
+                    remaining -= size
+        else:
+            candidates = paths
+
+        rendered = pool.map(lambda path: self.render_file(path, input_data.line_numbers), candidates)
+        kept, used_bytes, used_tokens = [], 0, 0
+        for path, part in zip(candidates, rendered):
+            tokens = estimate_tokens(part.decode("utf-8", errors="replace")) if input_data.max_tokens else 0
+            if max_bytes is not None and used_bytes + len(part) > max_bytes:
+                continue
+            if input_data.max_tokens and used_tokens + tokens > input_data.max_tokens:
+                continue
+            kept.append((path, part))
+            used_bytes += len(part)
+            used_tokens += tokens
+        kept_paths = {path for path, _ in kept}
+        return kept, [path for path in paths if path not in kept_paths]
+
+    def omitted_note(self, omitted: List[str]) -> bytes:
+        if not omitted:
+            return b""
+        return f"--- omitted to stay within the budget ({len(omitted)} files): {', '.join(omitted)} ---\n".encode()
+
+    def file_hash(self, path: str, hashes: Dict[str, Dict]) -> str:
+        stat = os.stat(path)
+        cached = hashes.get(path)
+        if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+            return cached["sha256"]
+        with mapped(path) as content:
+            digest = hashlib.sha256(content).hexdigest()
+        hashes[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest}
+        return digest
+
+    def snapshot(
+        self, pool: ThreadPoolExecutor, files: Dict[str, str], index: Dict, input_data: SnapToolInput
+    ) -> str:
+        options = input_data.model_dump(mode="json", exclude={"diff"})
+        previous = index.get("state")
+        if (
+            previous
+            and previous["options"] == options
+            and previous["files"] == files
+            and self.state_unchanged(previous)
+        ):
+            # Nothing changed since state.txt was written, so it is still current
+            with open(self.state_path, "rb") as fp:
+                return fp.read().decode("utf-8", errors="replace")
+
+        kept, omitted = self.fit_budget(pool, list(files), input_data)
+        parts = []
+        # Stream into a temporary file so a failed snapshot never leaves a partial state.txt
+        with open(self.state_path + ".tmp", "wb") as out:
+            for _, part in kept:
+                out.write(part)
+                parts.append(part)
+            note = self.omitted_note(omitted)
+            out.write(note)
+            parts.append(note)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+        stat = os.stat(self.state_path)
+        index["state"] = {
+            "options": options,
+            "files": files,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+        }
+        return b"".join(parts).decode("utf-8", errors="replace")
+
+    def render_diff(
+        self,
+        pool: ThreadPoolExecutor,
+        files: Dict[str, str],
+        baseline: Dict[str, str],
+        input_data: SnapToolInput,
+    ) -> str:
+        changed = [path for path, digest in files.items() if baseline.get(path) != digest]
+        deleted = [path for path in baseline if path not in files]
+        if not changed and not deleted:
+            return "No changes since the last snapshot."
+        kept, omitted = self.fit_budget(pool, changed, input_data)
+        parts = [part for _, part in kept]
+        parts += [f"--- {path} (deleted) ---\n".encode() for path in deleted]
+        parts.append(self.omitted_note(omitted))
+        return b"".join(parts).decode("utf-8", errors="replace")
+
+    def render_file(self, path: str, line_numbers: bool) -> bytes:
+        with mapped(path) as content:
+            if line_numbers:
+                body = b"".join(
+                    b"%6d  %s" % (line_num, line)
+                    for line_num, line in enumerate(content[:].splitlines(keepends=True), start=1)
+                )
+            else:
+                body = content[:]
+        return b"--- %s ---\n```\n%s\n" % (path.encode(), body)
+
+    def state_unchanged(self, previous: Dict) -> bool:
+        try:
+            stat = os.stat(self.state_path)
+        except FileNotFoundError:
+            return False
+        return stat.st_mtime_ns == previous["mtime_ns"] and stat.st_size == previous["size"]
+
+    def load_index(self) -> Dict:
+        try:
+            with open(self.index_path) as fp:
+                return json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"hashes": {}}
+
+    def save_index(self, index: Dict):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        with open(self.index_path + ".tmp", "w") as fp:
+            json.dump(index, fp)
+        os.replace(self.index_path + ".tmp", self.index_path)
@@ -0,0 +1,222 @@
+from tools.base_tool import BaseTool
+from tools.file_walker import matches, walk
+
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from enum import Enum
+import ast
+import json
+import os
+import re
+
+
+class SymbolAction(Enum):
+    OUTLINE = "OUTLINE"
+    SEARCH = "SEARCH"
+    GET = "GET"
+
+
+class SymbolToolInput(BaseModel):
+    action: SymbolAction = Field(
+        description="OUTLINE lists the symbols in `paths` (or the whole project), SEARCH finds symbols whose name matches `query`, GET returns the source of the symbols in `names`"
+    )
+    query: Optional[str] = Field(
+        default=None, description="Case-insensitive regular expression matched against qualified names, for SEARCH"
+    )
+    names: Optional[List[str]] = Field(
+        default=None,
+        description="Qualified names like `ToolKit.execute_tool`, optionally prefixed with the path as `toolkit.py:ToolKit.execute_tool`, for GET",
+    )
+    paths: Optional[List[str]] = Field(
+        default=None, description="Glob patterns limiting which files are searched or outlined"
+    )
+    line_numbers: bool = Field(default=False, description="Include line numbers in GET output")
+    max_results: int = Field(default=100, description="Maximum number of symbols listed")
+
+
+def extract_symbols(source: str) -> List[Dict]:
+    """Return the classes and functions defined in `source`, outermost first."""
+    symbols = []
+
+    def visit(node: ast.AST, prefix: str, in_class: bool):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                kind = "class"
+                signature = f"({', '.join(ast.unparse(base) for base in child.bases)})" if child.bases else ""
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "method" if in_class else "function"
+                if isinstance(child, ast.AsyncFunctionDef):
+                    kind = "async " + kind
+                signature = f"({ast.unparse(child.args)})"
+                if child.returns:
+                    signature += f" -> {ast.unparse(child.returns)}"
+            else:
+                continue
+            qualname = prefix + child.name
+            docstring = ast.get_docstring(child)
+            symbols.append(
+                {
+                    "name": qualname,
+                    "kind": kind,
+                    "signature": signature,
+                    # Decorators are part of the definition
+                    "start": min([child.lineno] + [d.lineno for d in child.decorator_list]),
+                    "end": child.end_lineno,
+                    "doc": docstring.strip().splitlines()[0] if docstring else None,
+                }
+            )
+            visit(child, qualname + ".", isinstance(child, ast.ClassDef))
+
+    visit(ast.parse(source), "", False)
+    return symbols
+
+
+class SymbolIndex:
+    """Classes and functions of every Python file in the project, with their line ranges.
+
+    Persisted to `.cache/symbols/index.json`; `update` re-parses only files
+    whose mtime or size changed, so keeping it current costs a stat pass.
+    """
+
+    def __init__(self, root: Optional[str] = None, path: Optional[str] = None) -> None:
+        self.root = root or os.getcwd()
+        self.path = path or os.path.join(self.root, ".cache", "symbols", "index.json")
+        self.files: Optional[Dict[str, Dict]] = None
+
+    def update(self) -> Dict[str, Dict]:
+        if self.files is None:
+            self.load()
+        changed = False
+        paths = walk(self.root, ["*.py"])
+        for path in paths:
+            stat = os.stat(os.path.join(self.root, path))
+            entry = self.files.get(path)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                continue
+            with open(os.path.join(self.root, path), "rb") as fp:
+                source = fp.read()
+            try:
+                symbols = extract_symbols(source)
+                error = None
+            except (SyntaxError, ValueError) as e:
+                symbols, error = [], str(e)
+            self.files[path] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "symbols": symbols,
+                "error": error,
+            }
+            changed = True
+
+        current = set(paths)
+        for path in [path for path in self.files if path not in current]:
+            del self.files[path]
+            changed = True
+        if changed:
+            self.save()
+        return self.files
+
+    def select(self, patterns: Optional[List[str]] = None) -> Dict[str, Dict]:
+        files = self.update()
+        return {path: entry for path, entry in sorted(files.items()) if not patterns or matches(patterns, path)}
+
+    def outline(self, patterns: Optional[List[str]] = None, max_symbols: Optional[int] = None) -> str:
+        lines = []
+        count = 0
+        for path, entry in self.select(patterns).items():
+            lines.append(path + (f"  (unparseable: {entry['error']})" if entry["error"] else ""))
+            for symbol in entry["symbols"]:
+                if max_symbols is not None and count >= max_symbols:
+                    lines.append("... more symbols omitted")
+                    return "\n".join(lines)
+                lines.append(self.describe(symbol, indent=True))
+                count += 1
+        return "\n".join(lines)
+
+    def describe(self, symbol: Dict, indent: bool = False, path: Optional[str] = None) -> str:
+        depth = symbol["name"].count(".") + 1 if indent else 0
+        location = f"{path}:" if path else ""
+        line = f"{'  ' * depth}{symbol['kind']} {symbol['name']}{symbol['signature']}  [{location}{symbol['start']}-{symbol['end']}]"
+        if symbol["doc"]:
+            line += f"  # {symbol['doc']}"
+        return line
+
+    def search(self, query: str, patterns: Optional[List[str]] = None, max_symbols: int = 100) -> List[str]:
+        regex = re.compile(query, re.IGNORECASE)
+        results = []
+        for path, entry in self.select(patterns).items():
+            for symbol in entry["symbols"]:
+                if regex.search(symbol["name"]):
+                    results.append(self.describe(symbol, path=path))
+                    if len(results) >= max_symbols:
+                        return results
+        return results
+
+    def source(self, name: str, patterns: Optional[List[str]] = None, line_numbers: bool = False) -> List[str]:
+        path_filter, _, qualname = name.rpartition(":")
+        blocks = []
+        for path, entry in self.select(patterns).items():
+            if path_filter and path != path_filter:
+                continue
+            for symbol in entry["symbols"]:
+                if symbol["name"] == qualname:
+                    blocks.append(self.read_lines(path, symbol, line_numbers))
+        return blocks
+
+    def read_lines(self, path: str, symbol: Dict, line_numbers: bool) -> str:
+        with open(os.path.join(self.root, path), encoding="utf-8", errors="replace") as fp:
+            # Split like the parser does; splitlines() also breaks on form feeds and the like
+            lines = fp.read().split("\n")[symbol["start"] - 1 : symbol["end"]]
+        if line_numbers:
+            lines = [f"{n:>6}  {line}" for n, line in enumerate(lines, start=symbol["start"])]
+        return f"--- {path}:{symbol['start']}-{symbol['end']} {symbol['name']} ---\n" + "\n".join(lines)
+
+    def load(self):
+        try:
+            with open(self.path) as fp:
+                self.files = json.load(fp)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.files = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "w") as fp:
+            json.dump(self.files, fp)
+        os.replace(self.path + ".tmp", self.path)
+
+
+class SymbolTool(BaseTool):
+    input_model = SymbolToolInput
+    description = "Look up classes and functions in the project's Python code: an outline of symbols with line ranges, a search by name, or the source of specific definitions. Much smaller than a full SnapTool snapshot."
+    blocking = True
+    read_only = True
+    # Calls share one index per directory and rewrite its cache file, so they take turns
+    max_concurrency = 1
+
+    def __init__(self, toolkit):
+        super().__init__(toolkit)
+        self.indexes: Dict[str, SymbolIndex] = {}
+
+    async def execute(self, input_data: SymbolToolInput) -> str:
+        # One index per working directory, kept in memory between calls
+        root = os.getcwd()
+        if root not in self.indexes:
+            self.indexes[root] = SymbolIndex(root)
+        index = self.indexes[root]
+
+        match input_data.action:
+            case SymbolAction.OUTLINE:
+                return index.outline(input_data.paths, input_data.max_results)
+            case SymbolAction.SEARCH:
+                if not input_data.query:
+                    return "Error: SEARCH requires a query"
+                results = index.search(input_data.query, input_data.paths, input_data.max_results)
+                return "\n".join(results) or f"No symbols match {input_data.query!r}"
+            case SymbolAction.GET:
+                if not input_data.names:
+                    return "Error: GET requires names"
+                blocks = []
+                for name in input_data.names:
+                    found = index.source(name, input_data.paths, input_data.line_numbers)
+                    blocks += found or [f"--- {name} not found ---"]
+                return "\n\n".join(blocks)
@@ -1,9 +1,11 @@
-from bs4 import BeautifulSoup
+from tools.html_parsing import extract_data_points, resolve_backend
 from tools.base_tool import BaseTool
 from pydantic import BaseModel, Field
+from collections import defaultdict
 from typing import Dict
 import traceback
 import asyncio
+import random
 import httpx
 import json
 import re
@@ -20,33 +22,94 @@ class WebScrapingToolInput(BaseModel):
     tasks: list[WebScrapingTask] = Field(
         description="List of web scraping tasks to perform. Every task must include a URL and MUST INCLUDE data_points"
     )
+    max_concurrency: int = Field(
+        default=8, description="Maximum number of pages fetched at the same time"
+    )
+    per_host_limit: int = Field(
+        default=2, description="Maximum number of simultaneous requests to any one host"
+    )
+    timeout: float = Field(default=20.0, description="Timeout in seconds for each request")
+    retries: int = Field(
+        default=2, description="Retries for connection errors, timeouts, 429 and 5xx responses"
+    )
 
 
 class WebScrapingTool(BaseTool):
     input_model = WebScrapingToolInput
     description = "Scrape structured information from web pages based on provided CSS selectors. A data_points mapping MUST be provided."
+    read_only = True
+
+    # Fastest installed HTML parser: selectolax, then lxml, then html.parser
+    parser_backend = resolve_backend()
+    # Seconds before the first retry, doubled (with jitter) for each further attempt
+    retry_backoff = 0.5
 
     async def execute(self, input_data: WebScrapingToolInput) -> str:
-        scraping_results = []
+        client = self.toolkit.http_clients.get()
+        semaphore = asyncio.Semaphore(input_data.max_concurrency)
+        host_semaphores = defaultdict(
+            lambda: asyncio.Semaphore(input_data.per_host_limit)
+        )
 
-        async with httpx.AsyncClient() as client:
-            for task in input_data.tasks:
-                try:
-                    response = await client.get(task.url)
-                    soup = BeautifulSoup(response.content, "html.parser")
-
-                    task_result = {"url": task.url, "data_points": {}}
-                    for data_point_name, selector in task.data_points.items():
-                        elements = soup.select(selector)
-                        # We might want to extract text, or other attributes, or HTML content
-                        task_result["data_points"][data_point_name] = [
-                            elem.get_text(strip=True) for elem in elements
-                        ]
-
-                    scraping_results.append(task_result)
-                except Exception as e:
-                    scraping_results.append(
-                        f"Got error on {task}: {e} {traceback.format_exc()}"
-                    )
+        # gather keeps the results in task order whatever order pages arrive in
+        scraping_results = await asyncio.gather(
+            *(
+                self.scrape(client, task, input_data, semaphore, host_semaphores)
+                for task in input_data.tasks
+            )
+        )
 
         return json.dumps(scraping_results)
+
+    async def scrape(
+        self,
+        client: httpx.AsyncClient,
+        task: WebScrapingTask,
+        input_data: WebScrapingToolInput,
+        semaphore: asyncio.Semaphore,
+        host_semaphores: Dict[str, asyncio.Semaphore],
+    ) -> Dict | str:
+        try:
+            host_semaphore = host_semaphores[httpx.URL(task.url).host]
+            response = await self.fetch(
+                client, task.url, input_data, semaphore, host_semaphore
+            )
+            # Parsing is CPU-bound, keep it off the loop so streaming isn't stalled
+            data_points = await asyncio.get_running_loop().run_in_executor(
+                self.toolkit.executor,
+                extract_data_points,
+                response.content,
+                task.data_points,
+                self.parser_backend,
+            )
+            return {"url": task.url, "data_points": data_points}
+        except Exception as e:
+            return f"Got error on {task}: {e} {traceback.format_exc()}"
+
+    async def fetch(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        input_data: WebScrapingToolInput,
+        semaphore: asyncio.Semaphore,
+        host_semaphore: asyncio.Semaphore,
+    ) -> httpx.Response:
+        for attempt in range(input_data.retries + 1):
+            last_attempt = attempt == input_data.retries
+            # Host first: waiting on a busy host must not hold a slot other hosts could use
+            async with host_semaphore, semaphore:
+                try:
+                    response = await self.toolkit.http_cache.get(
+                        client, url, timeout=input_data.timeout
+                    )
+                    if last_attempt or not (
+                        response.status_code == 429 or response.status_code >= 500
+                    ):
+                        return response
+                except httpx.TransportError:
+                    if last_attempt:
+                        raise
+            # Back off outside the semaphores so other hosts keep going
+            await asyncio.sleep(
+                self.retry_backoff * 2**attempt * (0.5 + random.random())
+            )